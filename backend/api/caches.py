@@ -0,0 +1,29 @@
+import hashlib
+import json
+
+from foodgram.caches import ProcessCache
+from tags.models import Tag
+
+from .serializers import TagSerializer
+
+
+class TagListCache(ProcessCache):
+    """Сериализованный список тегов в памяти процесса.
+
+    Список и отдельный тег отдаются из памяти без запросов к БД,
+    ETag считается по содержимому списка.
+    """
+    ttl_setting = 'TAGS_CACHE_TTL'
+
+    def build(self):
+        data = [
+            dict(tag)
+            for tag in TagSerializer(Tag.objects.all(), many=True).data
+        ]
+        etag = '"{}"'.format(hashlib.sha1(
+            json.dumps(data, sort_keys=True).encode()
+        ).hexdigest())
+        return data, {tag['id']: tag for tag in data}, etag
+
+
+tag_list_cache = TagListCache()
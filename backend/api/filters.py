@@ -1,9 +1,22 @@
 import django_filters as filters
+from django import forms
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connection
+from django.db.models import Exists, OuterRef, Q
+from django.db.models.functions import Greatest, Upper
 from django_filters.widgets import BooleanWidget
+from rest_framework.filters import SearchFilter
 
 from ingredients.models import Ingredients
-from recipes.models import Recipe
-from users.models import User
+from recipes.models import FavoriteRecipes, Recipe, ShoppingList, TagsRecipe
+from recipes.search import search_recipes
+
+POPULAR_ORDERING = ('-favorites_count', '-pub_date', '-id')
+
+USER_RECIPES = {
+    'is_favorited': FavoriteRecipes,
+    'is_in_shopping_cart': ShoppingList,
+}
 
 
 class IngredientNameFilter(filters.FilterSet):
@@ -20,23 +33,42 @@ class IngredientNameFilter(filters.FilterSet):
         )
 
 
+class AnyMultipleChoiceField(forms.MultipleChoiceField):
+    """Несколько значений без проверки по списку вариантов"""
+    def valid_value(self, value):
+        return True
+
+
+class AnyMultipleChoiceFilter(filters.MultipleChoiceFilter):
+    field_class = AnyMultipleChoiceField
+
+
 class RecipeFilter(filters.FilterSet):
-    tags = filters.AllValuesMultipleFilter(
-        field_name='tags__slug'
+    """Фильтры списка рецептов.
+
+    Теги, избранное и корзина проверяются подзапросами EXISTS, поэтому
+    рецепты не дублируются при нескольких тегах и выборка не соединяется
+    со связующими таблицами.
+    """
+    tags = AnyMultipleChoiceFilter(
+        method='filter_tags'
     )
-    author = filters.ModelChoiceFilter(
-        queryset=User.objects.all()
+    author = filters.NumberFilter(
+        field_name='author_id'
     )
     is_favorited = filters.BooleanFilter(
-        field_name='is_favorited',
-        method='get_is_favorited',
+        method='filter_user_recipes',
         widget=BooleanWidget()
     )
     is_in_shopping_cart = filters.BooleanFilter(
-        field_name='is_in_shopping_cart',
-        method='get_is_in_shopping_cart',
+        method='filter_user_recipes',
         widget=BooleanWidget()
     )
+    search = filters.CharFilter(method='search_text')
+    ordering = filters.ChoiceFilter(
+        choices=(('popular', 'По популярности'),),
+        method='order_by_popularity'
+    )
 
     class Meta:
         model = Recipe
@@ -44,17 +76,66 @@ class RecipeFilter(filters.FilterSet):
             'tags',
             'author',
             'is_favorited',
-            'is_in_shopping_cart'
+            'is_in_shopping_cart',
+            'search',
+            'ordering'
         )
 
-    def get_is_favorited(self, queryset, name, value):
-        user = self.request.user
-        if value:
-            return queryset.filter(recipe_favorites__user=user)
-        return queryset
+    def filter_tags(self, queryset, name, value):
+        return queryset.filter(Exists(TagsRecipe.objects.filter(
+            recipe=OuterRef('pk'),
+            tag__slug__in=value
+        )))
 
-    def get_is_in_shopping_cart(self, queryset, name, value):
+    def filter_user_recipes(self, queryset, name, value):
+        if not value:
+            return queryset
         user = self.request.user
-        if value:
-            return queryset.filter(recipe_shoppinglist__user=user)
-        return queryset
+        if user.is_anonymous:
+            return queryset.none()
+        return queryset.filter(Exists(USER_RECIPES[name].objects.filter(
+            user=user,
+            recipe=OuterRef('pk')
+        )))
+
+    def search_text(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
+    def order_by_popularity(self, queryset, name, value):
+        return queryset.order_by(*POPULAR_ORDERING)
+
+
+class TrigramSearchFilter(SearchFilter):
+    """Поиск по search_fields.
+
+    По умолчанию - icontains. С ?search_mode=similar на PostgreSQL ищет
+    по триграммам (индексы gin_trgm_ops) и сортирует по похожести.
+    """
+    search_mode_param = 'search_mode'
+
+    def filter_queryset(self, request, queryset, view):
+        if (
+            request.query_params.get(self.search_mode_param) != 'similar'
+            or connection.vendor != 'postgresql'
+        ):
+            return super().filter_queryset(request, queryset, view)
+        search_fields = self.get_search_fields(view, request)
+        term = ' '.join(self.get_search_terms(request))
+        if not search_fields or not term:
+            return queryset
+        uppers = {
+            f'{field.lstrip("^=@$")}_upper': Upper(field.lstrip('^=@$'))
+            for field in search_fields
+        }
+        condition = Q()
+        for alias in uppers:
+            condition |= Q(**{f'{alias}__trigram_similar': term})
+        similarities = [
+            TrigramSimilarity(alias, term) for alias in uppers
+        ]
+        return queryset.annotate(**uppers).filter(condition).annotate(
+            similarity=(
+                Greatest(*similarities) if len(similarities) > 1
+                else similarities[0]
+            )
+        ).order_by('-similarity')
@@ -0,0 +1,284 @@
+import base64
+import io
+import json
+import math
+import os
+import statistics
+import tempfile
+import time
+from itertools import product
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import (CaptureQueriesContext, override_settings,
+                               setup_test_environment,
+                               teardown_test_environment)
+from PIL import Image
+from rest_framework.test import APIClient
+
+from ingredients.models import Ingredients
+from recipes.models import Recipe
+from tags.models import Tag
+from users.models import User
+
+BUDGETS_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+    'benchmark_budgets.json'
+)
+GATED_METRICS = ('queries', 'bytes')
+
+
+def percentile(values, q):
+    """Перцентиль по ближайшему рангу для отсортированного списка"""
+    return values[max(0, math.ceil(q * len(values)) - 1)]
+
+
+class Command(BaseCommand):
+    """Бюджеты проверяются только по числу запросов и размеру ответа.
+
+    Время зависит от машины, поэтому p50/p95/p99 выводятся в отчет, но
+    не приводят к ошибке. Первые --warmup запросов каждого сценария
+    прогревают кэши и в замер не входят.
+    """
+    help = ('Замер числа запросов, времени и размера ответов основных '
+            'эндпоинтов на тестовой базе с синтетическими данными')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=2,
+            help='Сколько запросов сценария выполнить до замера'
+        )
+        parser.add_argument('--users', type=int, default=300)
+        parser.add_argument('--recipes', type=int, default=3000)
+        parser.add_argument('--limit', type=int, default=30)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--budgets', default=BUDGETS_PATH)
+        parser.add_argument(
+            '--report',
+            help='Сохранить результаты замеров в JSON'
+        )
+
+    def handle(self, *args, **options):
+        with open(options['budgets'], encoding='UTF-8') as budgets_file:
+            budgets = json.load(budgets_file)
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            with tempfile.TemporaryDirectory() as media_root:
+                with override_settings(MEDIA_ROOT=media_root):
+                    results = self.run_benchmarks(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+        failures = self.report(results, budgets)
+        if options['report']:
+            with open(options['report'], 'w', encoding='UTF-8') as report:
+                json.dump(results, report, ensure_ascii=False, indent=4)
+        if failures:
+            raise CommandError(
+                f'Превышены бюджеты: {", ".join(sorted(failures))}'
+            )
+        self.stdout.write(self.style.SUCCESS('Все бюджеты соблюдены'))
+
+    def seed(self, options):
+        call_command(
+            'generate_fake_data',
+            users=options['users'],
+            recipes=options['recipes'],
+            ingredients=500,
+            tags=6,
+            seed=options['seed'],
+            stdout=io.StringIO()
+        )
+
+    def measure(self, client, method, url, data=None, iterations=1,
+                headers=None):
+        timings, queries, size = [], 0, 0
+        for iteration in range(-self.warmup, iterations):
+            request_data = data() if callable(data) else data
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                response = getattr(client, method)(
+                    url, request_data, format='json', **(headers or {})
+                )
+                content = (
+                    b''.join(response.streaming_content)
+                    if response.streaming else response.content
+                )
+                timings.append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 400:
+                raise RuntimeError(
+                    f'{method.upper()} {url}: {response.status_code} '
+                    f'{content[:200]!r}'
+                )
+            if iteration < 0:
+                timings.pop()
+                continue
+            queries = max(queries, len(context.captured_queries))
+            size = max(size, len(content))
+        timings.sort()
+        return {
+            'queries': queries,
+            'p50_ms': statistics.median(timings),
+            'p95_ms': percentile(timings, 0.95),
+            'p99_ms': percentile(timings, 0.99),
+            'bytes': size,
+        }
+
+    def recipe_payload(self, names):
+        image = io.BytesIO()
+        Image.new('RGB', (64, 64), '#ffb74d').save(image, 'JPEG')
+        image = base64.b64encode(image.getvalue()).decode()
+        ingredients = list(Ingredients.objects.values_list(
+            'pk', flat=True
+        )[:10])
+        tags = list(Tag.objects.values_list('pk', flat=True)[:2])
+
+        def payload():
+            return {
+                'name': f'Бенчмарк {next(names)}',
+                'text': 'Описание',
+                'cooking_time': 10,
+                'image': f'data:image/jpeg;base64,{image}',
+                'tags': tags,
+                'ingredients': [
+                    {'id': pk, 'amount': 5} for pk in ingredients
+                ],
+            }
+        return payload
+
+    def run_benchmarks(self, options):
+        self.seed(options)
+        self.warmup = options['warmup']
+        iterations = options['iterations']
+        limit = options['limit']
+        viewer = User.objects.annotate(
+            follows=Count('follower')
+        ).order_by('-follows').first()
+        viewer.is_staff = True
+        viewer.save(update_fields=['is_staff'])
+        author = viewer.follower.values_list('author', flat=True).first()
+        tags = list(Tag.objects.values_list('slug', flat=True)[:2])
+        ingredient = Ingredients.objects.values_list('name', flat=True)[0]
+        anonymous = APIClient()
+        client = APIClient()
+        client.force_authenticate(viewer)
+
+        flows = []
+        filters = product(
+            ('', f'&tags={tags[0]}', f'&tags={tags[0]}&tags={tags[1]}'),
+            ('', f'&author={author}'),
+            ('', '&is_favorited=1'),
+            ('', '&is_in_shopping_cart=1'),
+        )
+        for combination in filters:
+            query = ''.join(combination)
+            flows.append(('recipe-list', client,
+                          f'/api/recipes/?limit={limit}{query}'))
+        flows += [
+            ('recipe-list', anonymous, f'/api/recipes/?limit={limit}'),
+            ('recipe-list', client,
+             f'/api/recipes/?limit={limit}&page=5'),
+            ('recipe-list', client,
+             f'/api/recipes/?limit={limit}&ordering=popular'),
+            ('recipe-search', client,
+             f'/api/recipes/?limit={limit}&search=рецепт'),
+            ('recipe-search', client,
+             f'/api/recipes/?limit={limit}&search=рецепт+12&tags={tags[0]}'),
+            ('recipe-list-cursor', client,
+             f'/api/recipes/?limit={limit}&pagination=cursor'),
+            ('recipe-detail', client,
+             f'/api/recipes/{Recipe.objects.values_list("pk").first()[0]}/'),
+            ('subscriptions', client,
+             f'/api/users/subscriptions/?limit={limit}&recipes_limit=3'),
+            ('user-list', client, f'/api/users/?limit={limit}'),
+            ('ingredient-search', client,
+             f'/api/ingredients/?name={ingredient[:3]}'),
+            ('tag-list', anonymous, '/api/tags/'),
+        ]
+        flows += [
+            ('shopping-cart-download', client,
+             f'/api/recipes/download_shopping_cart/?format={file_format}')
+            for file_format in ('txt', 'csv', 'json', 'pdf')
+        ]
+        results = {}
+        for group, flow_client, url in flows:
+            self.stdout.write(f'GET {url}')
+            results[f'GET {url}'] = {
+                'group': group,
+                **self.measure(flow_client, 'get', url,
+                               iterations=iterations),
+            }
+
+        for group, url in (
+            ('recipe-list-not-modified', f'/api/recipes/?limit={limit}'),
+            ('recipe-detail-not-modified',
+             f'/api/recipes/{Recipe.objects.values_list("pk").first()[0]}/'),
+        ):
+            etag = client.get(url)['ETag']
+            self.stdout.write(f'GET {url} (If-None-Match)')
+            results[f'GET {url} (If-None-Match)'] = {
+                'group': group,
+                **self.measure(client, 'get', url, iterations=iterations,
+                               headers={'HTTP_IF_NONE_MATCH': etag}),
+            }
+
+        names = iter(range(10 ** 9))
+        payload = self.recipe_payload(names)
+        results['POST /api/recipes/'] = {
+            'group': 'recipe-create',
+            **self.measure(client, 'post', '/api/recipes/', payload,
+                           iterations=iterations),
+        }
+        recipe = Recipe.objects.filter(author=viewer).latest('pk')
+        results[f'PATCH /api/recipes/{recipe.pk}/'] = {
+            'group': 'recipe-update',
+            **self.measure(client, 'patch', f'/api/recipes/{recipe.pk}/',
+                           payload, iterations=iterations),
+        }
+        results[f'PATCH /api/recipes/{recipe.pk}/ (name)'] = {
+            'group': 'recipe-partial-update',
+            **self.measure(
+                client, 'patch', f'/api/recipes/{recipe.pk}/',
+                lambda: {'name': f'Бенчмарк {next(names)}'},
+                iterations=iterations
+            ),
+        }
+        return results
+
+    def report(self, results, budgets):
+        failures = set()
+        self.stdout.write(
+            f'{"запрос":70} {"SQL":>4} {"p50":>8} {"p95":>8} {"p99":>8} '
+            f'{"байт":>8}'
+        )
+        for name, result in results.items():
+            budget = budgets.get(result['group'], {})
+            over = [
+                metric for metric, limit in budget.items()
+                if metric in GATED_METRICS and result[metric] > limit
+            ]
+            if over:
+                failures.add(result['group'])
+            self.stdout.write(
+                f'{name[:70]:70} {result["queries"]:>4} '
+                f'{result["p50_ms"]:>8.1f} {result["p95_ms"]:>8.1f} '
+                f'{result["p99_ms"]:>8.1f} {result["bytes"]:>8}'
+                + (f'  ПРЕВЫШЕНО: {", ".join(over)}' if over else '')
+            )
+        missing = {
+            result['group'] for result in results.values()
+        } - set(budgets)
+        if missing:
+            self.stderr.write(
+                f'Нет бюджетов для: {", ".join(sorted(missing))}'
+            )
+            failures |= missing
+        return failures
@@ -0,0 +1,10 @@
+from rest_framework.negotiation import BaseContentNegotiation
+
+
+class IgnoreFormatNegotiation(BaseContentNegotiation):
+    """Первый рендерер без учёта ?format=, который занят под формат файла"""
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return (renderers[0], renderers[0].media_type)
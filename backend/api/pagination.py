@@ -1,7 +1,125 @@
+import json
+
 from django.conf import settings
-from rest_framework.pagination import PageNumberPagination
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 
 
 class CustomPagination(PageNumberPagination):
     page_size = settings.PAGINATION_PAGE_SIZE
     page_size_query_param = 'limit'
+
+
+class RecipeCursorPagination(CursorPagination):
+    """Курсор по ключу (pub_date, id) без OFFSET.
+
+    В курсоре хранятся значения всех полей сортировки, а не только
+    первого, поэтому следующая страница выбирается условием
+    (pub_date, id) < (x, y) и не зависит от совпадающих дат.
+    """
+    page_size = settings.PAGINATION_PAGE_SIZE
+    page_size_query_param = 'limit'
+    ordering = ('-pub_date', '-id')
+
+    def _get_position_from_instance(self, instance, ordering):
+        return json.dumps([
+            str(super(RecipeCursorPagination, self)
+                ._get_position_from_instance(instance, [order]))
+            for order in ordering
+        ])
+
+    def get_position_filter(self, model, position, reverse):
+        try:
+            values = json.loads(position)
+            if len(values) != len(self.ordering):
+                raise ValueError
+            fields = [
+                (order, model._meta.get_field(order.lstrip('-')))
+                for order in self.ordering
+            ]
+            values = [
+                field.to_python(value)
+                for (_, field), value in zip(fields, values)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        condition = Q()
+        equal = {}
+        for (order, field), value in zip(fields, values):
+            lookup = 'gt' if order.startswith('-') == reverse else 'lt'
+            condition |= Q(**equal, **{f'{field.name}__{lookup}': value})
+            equal[field.name] = value
+        return condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        position = self.cursor.position if self.cursor else None
+        if reverse:
+            queryset = queryset.order_by(*(
+                order[1:] if order.startswith('-') else f'-{order}'
+                for order in self.ordering
+            ))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            queryset = queryset.filter(self.get_position_filter(
+                queryset.model, position, reverse
+            ))
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        following = None
+        if len(results) > self.page_size:
+            following = self._get_position_from_instance(
+                results[-1], self.ordering
+            )
+        if reverse:
+            self.page.reverse()
+            self.next_position, self.previous_position = position, following
+        else:
+            self.next_position, self.previous_position = following, position
+        self.has_next = self.next_position is not None
+        self.has_previous = self.previous_position is not None
+        self.display_page_controls = self.has_next or self.has_previous
+        return self.page
+
+
+class RecipePagination(CustomPagination):
+    """Постраничная пагинация; с ?pagination=cursor - курсорная.
+
+    Курсорная не считает COUNT(*) и не делает OFFSET по всей выборке.
+    Сортировка ?ordering=popular идет по изменяемому favorites_count,
+    на котором курсор не дает стабильных страниц, поэтому в этом режиме
+    всегда используется постраничная пагинация.
+    """
+    mode_query_param = 'pagination'
+
+    def use_cursor(self, request):
+        params = request.query_params
+        if params.get('ordering') == 'popular':
+            return False
+        return (
+            params.get(self.mode_query_param) == 'cursor'
+            or RecipeCursorPagination.cursor_query_param in params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if self.use_cursor(request):
+            self.cursor_paginator = RecipeCursorPagination()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -1,15 +1,38 @@
+import hashlib
+from collections import Counter, OrderedDict, defaultdict
+
 import webcolors
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Manager, prefetch_related_objects
 from djoser.serializers import UserCreateSerializer
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
+from sorl.thumbnail import default as thumbnail_default
 
 from ingredients.models import Ingredients
 from recipes.models import (FavoriteRecipes, IngredientInRecipe, Recipe,
-                            ShoppingList, TagsRecipe)
+                            ShoppingCartIngredient, ShoppingList, TagsRecipe,
+                            recipe_prefetches)
 from tags.models import Tag
 from users.models import Follow, User
 
 
+def get_followed_authors(request):
+    """Id авторов, на которых подписан текущий пользователь.
+
+    Вычисляется один раз за запрос и используется всеми сериализаторами.
+    """
+    if not hasattr(request, '_followed_authors'):
+        request._followed_authors = set(
+            Follow.objects.filter(
+                user=request.user
+            ).values_list('author_id', flat=True)
+        )
+    return request._followed_authors
+
+
 class Hex2NameColor(serializers.Field):
     """Пользовательское поле для HEX-цвета"""
     def to_representation(self, value):
@@ -25,6 +48,51 @@ class Hex2NameColor(serializers.Field):
         return webcolors.hex_to_name(data)
 
 
+class ImageVariantsField(serializers.ReadOnlyField):
+    """Ссылки на уменьшенные копии фото рецепта.
+
+    Если копии построены для другого фото (оно сменилось, а новые копии
+    еще не готовы), для каждого размера отдается ссылка на само фото
+    с ключом original.
+    """
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        super().__init__(**kwargs)
+
+    def absolute_url(self, url):
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+    def to_representation(self, recipe):
+        variants = recipe.image_variants
+        if variants.get('source') != recipe.image.name:
+            if not recipe.image:
+                return {}
+            original = {'original': self.absolute_url(recipe.image.url)}
+            return {
+                size: original for size in settings.RECIPE_IMAGE_VARIANTS
+            }
+        return {
+            size: {
+                image_format: self.absolute_url(
+                    thumbnail_default.storage.url(name)
+                )
+                for image_format, name in files.items()
+            }
+            for size, files in variants.items()
+            if size != 'source'
+        }
+
+
+class BulkIdsSerializer(serializers.Serializer):
+    """Список id для массового добавления или удаления"""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BULK_MAX_IDS
+    )
+
+
 class UserCreateSerializer(UserCreateSerializer):
     """Создание юзера"""
     class Meta(UserCreateSerializer.Meta):
@@ -53,16 +121,17 @@ class UserSerializer(serializers.ModelSerializer):
             'email',
             'first_name',
             'last_name',
-            'is_subscribed'
+            'is_subscribed',
+            'recipes_count',
+            'followers_count'
         )
+        read_only_fields = ('recipes_count', 'followers_count')
 
     def get_is_subscribed(self, obj):
-        user = self.context['request']
-        if user is None or user.user.is_anonymous:
+        request = self.context.get('request')
+        if request is None or request.user.is_anonymous:
             return False
-        return Follow.objects.filter(
-            user=user.user, author=obj
-        ).exists()
+        return obj.id in get_followed_authors(request)
 
 
 class FollowSerializer(serializers.ModelSerializer):
@@ -155,8 +224,11 @@ class IngredientInRecipeSerializer(serializers.ModelSerializer):
 
 
 class CreateIngredientInRecipeSerializer(serializers.ModelSerializer):
-    """Добавление ингредиентов в рецепт"""
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredients.objects.all())
+    """Добавление ингредиентов в рецепт.
+
+    Id проверяются разом для всего списка в RecipeCreateUpdateSerializer.
+    """
+    id = serializers.IntegerField()
     amount = serializers.IntegerField()
 
     class Meta:
@@ -167,8 +239,32 @@ class CreateIngredientInRecipeSerializer(serializers.ModelSerializer):
         )
 
 
+class RecipeListSerializer(serializers.ListSerializer):
+    """Список рецептов: общая часть читается из кэша разом для всех"""
+    def to_representation(self, data):
+        recipes = list(data.all() if isinstance(data, Manager) else data)
+        self.child.load_shared(recipes)
+        return [self.child.to_representation(recipe) for recipe in recipes]
+
+
 class RecipeSerializer(serializers.ModelSerializer):
-    """Вывод рецептов"""
+    """Вывод рецептов.
+
+    Поля из SHARED_FIELDS одинаковы для всех пользователей и кэшируются
+    по ключу с updated_at рецепта; автор, флаги и счётчики вычисляются
+    для каждого запроса.
+    """
+    SHARED_FIELDS = (
+        'id',
+        'name',
+        'text',
+        'image',
+        'image_variants',
+        'ingredients',
+        'tags',
+        'cooking_time',
+    )
+
     author = UserSerializer(
         read_only=True
     )
@@ -179,6 +275,7 @@ class RecipeSerializer(serializers.ModelSerializer):
         read_only=False
     )
     image = Base64ImageField()
+    image_variants = ImageVariantsField()
     cooking_time = serializers.IntegerField()
     is_favorited = serializers.SerializerMethodField(
         label='Находится ли в избранном'
@@ -195,14 +292,76 @@ class RecipeSerializer(serializers.ModelSerializer):
             'text',
             'author',
             'image',
+            'image_variants',
             'ingredients',
             'tags',
             'cooking_time',
             'is_favorited',
-            'is_in_shopping_cart'
+            'is_in_shopping_cart',
+            'favorites_count',
+            'shopping_cart_count'
         )
+        read_only_fields = ('favorites_count', 'shopping_cart_count')
+        list_serializer_class = RecipeListSerializer
+
+    def cache_key(self, recipe):
+        request = self.context.get('request')
+        base_url = request.build_absolute_uri('/') if request else ''
+        return 'recipe:{}:{}:{}'.format(
+            recipe.pk,
+            recipe.updated_at.timestamp(),
+            hashlib.md5(base_url.encode()).hexdigest()[:8]
+        )
+
+    @staticmethod
+    def field_value(field, instance):
+        attribute = field.get_attribute(instance)
+        if attribute is None:
+            return None
+        return field.to_representation(attribute)
+
+    def load_shared(self, recipes):
+        """Общая часть представления рецептов.
+
+        Промахи кэша догружают теги и ингредиенты одним запросом на все
+        рецепты, а результат кладётся в кэш.
+        """
+        keys = {self.cache_key(recipe): recipe for recipe in recipes}
+        shared = cache.get_many(keys)
+        missing = {
+            key: recipe for key, recipe in keys.items() if key not in shared
+        }
+        prefetch_related_objects(list(missing.values()), *recipe_prefetches())
+        fresh = {
+            key: {
+                field.field_name: self.field_value(field, recipe)
+                for field in self._readable_fields
+                if field.field_name in self.SHARED_FIELDS
+            }
+            for key, recipe in missing.items()
+        }
+        cache.set_many(fresh, settings.RECIPE_CACHE_TTL)
+        shared.update(fresh)
+        self._shared = {
+            recipe.pk: shared[key] for key, recipe in keys.items()
+        }
 
-    def in_card(self, obj, model):
+    def to_representation(self, recipe):
+        if recipe.pk not in getattr(self, '_shared', {}):
+            self.load_shared([recipe])
+        shared = self._shared[recipe.pk]
+        return OrderedDict(
+            (
+                field.field_name,
+                shared[field.field_name] if field.field_name in shared
+                else self.field_value(field, recipe)
+            )
+            for field in self._readable_fields
+        )
+
+    def in_card(self, obj, model, annotation):
+        if hasattr(obj, annotation):
+            return getattr(obj, annotation)
         request = self.context.get('request').user.id
         return model.objects.filter(
             user=request,
@@ -210,10 +369,10 @@ class RecipeSerializer(serializers.ModelSerializer):
         ).exists()
 
     def get_is_favorited(self, obj):
-        return self.in_card(obj, FavoriteRecipes)
+        return self.in_card(obj, FavoriteRecipes, 'is_favorited')
 
     def get_is_in_shopping_cart(self, obj):
-        return self.in_card(obj, ShoppingList)
+        return self.in_card(obj, ShoppingList, 'is_in_shopping_cart')
 
 
 class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
@@ -221,10 +380,7 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
     ingredients = CreateIngredientInRecipeSerializer(
         many=True
     )
-    tags = serializers.PrimaryKeyRelatedField(
-        many=True,
-        queryset=Tag.objects.all()
-    )
+    tags = serializers.ListField(child=serializers.IntegerField())
     image = Base64ImageField()
     cooking_time = serializers.IntegerField()
 
@@ -241,34 +397,89 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
         )
         read_only_fields = ('author',)
 
-    def validate(self, data):
-        tags = data['tags']
-        if tags is None:
-            raise serializers.ValidationError(
+    @staticmethod
+    def does_not_exist(pk):
+        return serializers.PrimaryKeyRelatedField.default_error_messages[
+            'does_not_exist'
+        ].format(pk_value=pk)
+
+    def check_tags(self, tag_ids, errors):
+        """Теги по id одним запросом"""
+        if not tag_ids:
+            errors['non_field_errors'].append(
                 'Необходимо добавить хотя бы один тэг'
             )
-        cooking_time = data['cooking_time']
-        if int(cooking_time) <= 0:
-            raise serializers.ValidationError(
+            return []
+        tags = Tag.objects.in_bulk(set(tag_ids))
+        missing = [pk for pk in tag_ids if pk not in tags]
+        if missing:
+            errors['tags'] = [self.does_not_exist(pk) for pk in missing]
+        errors['non_field_errors'] += [
+            f'Тег {tags[pk]} указан несколько раз'
+            for pk, count in Counter(tag_ids).items()
+            if count > 1 and pk in tags
+        ]
+        return [tags[pk] for pk in tag_ids if pk in tags]
+
+    def check_ingredients(self, items, errors):
+        """Ингредиенты по id одним запросом; ошибки по каждому пункту"""
+        if not items:
+            errors['non_field_errors'].append('Вы забыли добавить ингредиенты')
+            return []
+        ids = [item['id'] for item in items]
+        ingredients = Ingredients.objects.in_bulk(set(ids))
+        item_errors = [
+            {} if item['id'] in ingredients
+            else {'id': [self.does_not_exist(item['id'])]}
+            for item in items
+        ]
+        if any(item_errors):
+            errors['ingredients'] = item_errors
+        errors['non_field_errors'] += [
+            f'Минимальное количество {ingredients[item["id"]]} - 1'
+            for item in items
+            if item['id'] in ingredients and item['amount'] <= 0
+        ]
+        errors['non_field_errors'] += [
+            f'Ингредиент {ingredients[pk]} уже добавлен'
+            for pk, count in Counter(ids).items()
+            if count > 1 and pk in ingredients
+        ]
+        return [
+            {'id': ingredients[item['id']], 'amount': item['amount']}
+            for item in items if item['id'] in ingredients
+        ]
+
+    def check_name(self, name, errors):
+        """Название уникально в пределах автора (unique_name_author)"""
+        author = (
+            self.instance.author_id if self.instance
+            else self.context['request'].user.pk
+        )
+        recipes = Recipe.objects.filter(name=name, author_id=author)
+        if self.instance:
+            recipes = recipes.exclude(pk=self.instance.pk)
+        if recipes.exists():
+            errors['name'].append('У автора уже есть рецепт с таким названием')
+
+    def validate(self, data):
+        errors = defaultdict(list)
+        if 'name' in data:
+            self.check_name(data['name'], errors)
+        if 'tags' in data:
+            data['tags'] = self.check_tags(data['tags'], errors)
+        if 'cooking_time' in data and data['cooking_time'] <= 0:
+            errors['non_field_errors'].append(
                 'Минимальное время приготовления - 1 минута'
             )
-        ingredients = data['ingredients']
-        if ingredients is None:
+        if 'ingredients' in data:
+            data['ingredients'] = self.check_ingredients(
+                data['ingredients'], errors
+            )
+        if any(errors.values()):
             raise serializers.ValidationError(
-                'Вы забыли добавить ингредиенты'
+                {key: value for key, value in errors.items() if value}
             )
-        ingredients_list = []
-        for ingredient in ingredients:
-            name = ingredient['id']
-            if int(ingredient['amount']) <= 0:
-                raise serializers.ValidationError(
-                    f'Минимальное количество {name} - 1'
-                )
-            if name in ingredients_list:
-                raise serializers.ValidationError(
-                    f'Ингредиент {name} уже добавлен'
-                )
-            ingredients_list.append(name)
         return data
 
     def add_tag(self, tags, recipe):
@@ -301,24 +512,91 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
         self.add_ingredient(ingredients, recipe)
         return recipe
 
-    def update(self, instance, validated_data):
-        instance.name = validated_data.get('name', instance.name)
-        instance.text = validated_data.get('text', instance.text)
-        instance.image = validated_data.get('image', instance.image)
-        instance.cooking_time = validated_data.get(
-            'cooking_time',
-            instance.cooking_time
+    def update_tags(self, recipe, tags):
+        """Удаляет снятые теги и добавляет новые, остальные не трогает"""
+        current = set(TagsRecipe.objects.filter(
+            recipe=recipe
+        ).values_list('tag_id', flat=True))
+        new = {tag.id for tag in tags}
+        if current - new:
+            TagsRecipe.objects.filter(
+                recipe=recipe,
+                tag_id__in=current - new
+            ).delete()
+        if new - current:
+            TagsRecipe.objects.bulk_create(
+                TagsRecipe(recipe=recipe, tag_id=tag_id)
+                for tag_id in new - current
+            )
+
+    def update_ingredients(self, recipe, ingredients):
+        """Применяет к ингредиентам рецепта только разницу с новыми"""
+        current = {
+            row.ingredient_id: row
+            for row in IngredientInRecipe.objects.select_for_update().filter(
+                recipe=recipe
+            )
+        }
+        new = {
+            ingredient['id'].id: ingredient['amount']
+            for ingredient in ingredients
+        }
+        old_amounts = {
+            ingredient_id: row.amount for ingredient_id, row in current.items()
+        }
+        if old_amounts == new:
+            return
+        removed = current.keys() - new.keys()
+        if removed:
+            # удаление поштучное, корзины пересчитывает сигнал
+            IngredientInRecipe.objects.filter(
+                recipe=recipe,
+                ingredient_id__in=removed
+            ).delete()
+        changed = []
+        for ingredient_id, row in current.items():
+            if ingredient_id in new and row.amount != new[ingredient_id]:
+                row.amount = new[ingredient_id]
+                changed.append(row)
+        if changed:
+            IngredientInRecipe.objects.bulk_update(changed, ['amount'])
+        if new.keys() - current.keys():
+            IngredientInRecipe.objects.bulk_create(
+                IngredientInRecipe(
+                    recipe=recipe,
+                    ingredient_id=ingredient_id,
+                    amount=new[ingredient_id]
+                )
+                for ingredient_id in new.keys() - current.keys()
+            )
+        ShoppingCartIngredient.objects.change_recipe(
+            recipe,
+            {
+                ingredient_id: amount
+                for ingredient_id, amount in old_amounts.items()
+                if ingredient_id in new
+            },
+            new
         )
-        tags_data = validated_data.pop('tags')
-        instance.tags.clear()
-        self.add_tag(tags_data, instance)
-        ingredients_data = validated_data.pop('ingredients')
-        instance.ingredients.clear()
-        self.add_ingredient(ingredients_data, instance)
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        tags = validated_data.pop('tags', None)
+        ingredients = validated_data.pop('ingredients', None)
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        if tags is not None:
+            self.update_tags(instance, tags)
+        if ingredients is not None:
+            self.update_ingredients(instance, ingredients)
         instance.save()
         return instance
 
     def to_representation(self, recipe):
+        request = self.context.get('request')
+        recipe = Recipe.objects.with_related().with_user_flags(
+            request.user
+        ).get(pk=recipe.pk)
         return RecipeSerializer(
             recipe,
             context={'request': self.context.get('request')}
@@ -327,12 +605,15 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
 
 class RecipeMinifiedSerializer(serializers.ModelSerializer):
     """Мини-формат рецепта"""
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = Recipe
         fields = (
             'id',
             'name',
             'image',
+            'image_variants',
             'cooking_time',
         )
 
@@ -350,9 +631,7 @@ class UserWithRecipesSerializer(serializers.ModelSerializer):
     recipes = serializers.SerializerMethodField(
         label='Рецепты пользователя'
     )
-    recipes_count = serializers.SerializerMethodField(
-        label='Общее количество рецептов пользователя'
-    )
+    recipes_count = serializers.ReadOnlyField(source='author.recipes_count')
 
     class Meta:
         model = User
@@ -371,22 +650,20 @@ class UserWithRecipesSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         if not request or request.user.is_anonymous:
             return False
+        if obj.user_id == request.user.id:
+            return True
         return Follow.objects.filter(
             user=obj.user,
             author=obj.author
         ).exists()
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        limit = request.GET.get('recipes_limit')
-        queryset = Recipe.objects.filter(author=obj.author)
-        if limit is not None:
-            queryset = Recipe.objects.filter(
-                author=obj.author
-            )[:int(limit)]
+        if hasattr(obj.author, 'subscription_recipes'):
+            queryset = obj.author.subscription_recipes
+        else:
+            request = self.context.get('request')
+            limit = request.GET.get('recipes_limit')
+            queryset = Recipe.objects.filter(author=obj.author)
+            if limit is not None:
+                queryset = queryset[:int(limit)]
         return RecipeMinifiedSerializer(queryset, many=True).data
-
-    def get_recipes_count(self, obj):
-        return Recipe.objects.filter(
-            author=obj.author
-        ).count()
@@ -1,31 +1,145 @@
+import csv
+import io
+import json
+import os
+from itertools import chain
+
 from django.conf import settings
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.db.models import F
+from django.http import StreamingHttpResponse
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from recipes.models import ShoppingCartIngredient
+
+SHOPPING_LIST_HEADER = 'Список продуктов к покупке:'
+PDF_FONT_NAME = 'ShoppingListFont'
+PDF_FONT_SIZE = 11
+PDF_LINE_HEIGHT = 16
+PDF_MARGIN = 20 * mm
+PDF_CHUNK_SIZE = 64 * 1024
+
 
-from recipes.models import IngredientInRecipe
+class Echo:
+    """Псевдо-буфер: csv.writer пишет строку и сразу её возвращает"""
+    def write(self, value):
+        return value
 
 
-def get_ingredients_for_shopping(user):
-    ingredients = IngredientInRecipe.objects.filter(
-        recipe__recipe_shoppinglist__user=user
+def get_shopping_ingredients(user):
+    return ShoppingCartIngredient.objects.filter(
+        user=user
     ).values(
         'ingredient__name',
         'ingredient__measurement_unit',
-    ).annotate(
-        value=Sum('amount')
-    ).order_by('ingredient__name')
-    response = HttpResponse(
-        content_type='text/plain',
-        charset='utf-8',
+        value=F('amount')
+    ).order_by('ingredient__name').iterator(
+        chunk_size=settings.SHOPPING_LIST_CHUNK_SIZE
     )
-    response['Content-Disposition'] = (
-        f'attachment; filename={settings.SHOPPING_LIST_FILENAME}'
+
+
+def shopping_line(ingredient):
+    return (
+        f'- {ingredient["ingredient__name"]} '
+        f'- {ingredient["value"]} '
+        f'{ingredient["ingredient__measurement_unit"]}'
     )
-    response.write('Список продуктов к покупке:\n')
+
+
+def render_txt(ingredients):
+    yield f'{SHOPPING_LIST_HEADER}\n'
+    for ingredient in ingredients:
+        yield f'{shopping_line(ingredient)}\n'
+
+
+def render_csv(ingredients):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('name', 'amount', 'measurement_unit'))
+    for ingredient in ingredients:
+        yield writer.writerow((
+            ingredient['ingredient__name'],
+            ingredient['value'],
+            ingredient['ingredient__measurement_unit'],
+        ))
+
+
+def render_json(ingredients):
+    separator = ''
+    yield '['
     for ingredient in ingredients:
-        response.write(
-            f'- {ingredient["ingredient__name"]} '
-            f'- {ingredient["value"]} '
-            f'{ingredient["ingredient__measurement_unit"]}\n'
-        )
+        yield separator + json.dumps({
+            'name': ingredient['ingredient__name'],
+            'amount': ingredient['value'],
+            'measurement_unit': ingredient['ingredient__measurement_unit'],
+        }, ensure_ascii=False)
+        separator = ','
+    yield ']'
+
+
+def get_pdf_font():
+    """Шрифт с кириллицей из SHOPPING_LIST_PDF_FONT.
+
+    Если файла нет, используется встроенная Helvetica без кириллицы.
+    """
+    path = settings.SHOPPING_LIST_PDF_FONT
+    if not path or not os.path.exists(path):
+        return 'Helvetica'
+    if PDF_FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(TTFont(PDF_FONT_NAME, path))
+    return PDF_FONT_NAME
+
+
+def render_pdf(ingredients):
+    """PDF со списком покупок, по строке на ингредиент.
+
+    Строки читаются из БД пачками, как и для других форматов, но PDF
+    собирается целиком (таблица ссылок пишется в конце файла), поэтому
+    отдаётся кусками после сборки. Память растёт только с размером
+    самого файла.
+    """
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4, pageCompression=1)
+    font = get_pdf_font()
+    top = A4[1] - PDF_MARGIN
+    y = top
+    lines = chain(
+        [SHOPPING_LIST_HEADER],
+        (shopping_line(ingredient) for ingredient in ingredients)
+    )
+    for line in lines:
+        if y < PDF_MARGIN:
+            pdf.showPage()
+            y = top
+        pdf.setFont(font, PDF_FONT_SIZE)
+        pdf.drawString(PDF_MARGIN, y, line)
+        y -= PDF_LINE_HEIGHT
+    pdf.save()
+    buffer.seek(0)
+    yield from iter(lambda: buffer.read(PDF_CHUNK_SIZE), b'')
+
+
+SHOPPING_LIST_FORMATS = {
+    'txt': (render_txt, 'text/plain'),
+    'csv': (render_csv, 'text/csv'),
+    'json': (render_json, 'application/json'),
+    'pdf': (render_pdf, 'application/pdf'),
+}
+
+
+def get_ingredients_for_shopping(user, file_format='txt'):
+    renderer, content_type = SHOPPING_LIST_FORMATS[file_format]
+    response = StreamingHttpResponse(
+        renderer(get_shopping_ingredients(user)),
+        content_type=(
+            content_type if content_type == 'application/pdf'
+            else f'{content_type}; charset=utf-8'
+        ),
+    )
+    filename = os.path.splitext(settings.SHOPPING_LIST_FILENAME)[0]
+    response['Content-Disposition'] = (
+        f'attachment; filename={filename}.{file_format}'
+    )
     return response
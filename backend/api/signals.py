@@ -0,0 +1,12 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from tags.models import Tag
+
+from .caches import tag_list_cache
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tag_list(**kwargs):
+    tag_list_cache.invalidate()
@@ -1,35 +1,108 @@
+import hashlib
+import json
 from http import HTTPStatus
 
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import F, OuterRef, Prefetch, Subquery
+from django.http import Http404
 from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, parse_etags
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
-from rest_framework import filters, status, viewsets
+from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import SAFE_METHODS, AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
 from ingredients.models import Ingredients
-from recipes.models import FavoriteRecipes, Recipe, ShoppingList
+from ingredients.search import ingredient_index
+from recipes.models import (RECIPE_COUNTERS, FavoriteRecipes, Recipe,
+                            ShoppingCartIngredient, ShoppingList)
+from recipes.tasks import delete_recipe_image
 from tags.models import Tag
 from users.models import Follow, User
 
-from .filters import IngredientNameFilter, RecipeFilter
-from .pagination import CustomPagination
+from .caches import tag_list_cache
+from .filters import IngredientNameFilter, RecipeFilter, TrigramSearchFilter
+from .negotiation import IgnoreFormatNegotiation
+from .pagination import CustomPagination, RecipePagination
 from .permissions import AdminOrReadOnly, AuthorOrReadOnly
-from .serializers import (FollowSerializer, IngredientsSerializer,
+from .serializers import (BulkIdsSerializer, IngredientsSerializer,
                           RecipeCreateUpdateSerializer,
                           RecipeMinifiedSerializer, RecipeSerializer,
                           TagSerializer, UserCreateSerializer, UserSerializer,
                           UserWithRecipesSerializer)
-from .services import get_ingredients_for_shopping
+from .services import SHOPPING_LIST_FORMATS, get_ingredients_for_shopping
+
+BULK_STATUSES = {
+    'POST': ('added', 'already_added'),
+    'DELETE': ('removed', 'not_added'),
+}
+
+
+def bulk_change(request, model, field, targets):
+    """Массовое добавление или удаление связей пользователя с объектами.
+
+    Id проверяются одним запросом, изменение делается одной вставкой или
+    одним удалением. Возвращает id изменённых объектов и статус по
+    каждому присланному id. Статусы считаются по связям, которые уже были
+    до вставки; строки, вставленные параллельным запросом между чтением
+    и вставкой, пропускаются (ignore_conflicts) вместо ошибки 500.
+    """
+    serializer = BulkIdsSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    ids = list(dict.fromkeys(serializer.validated_data['ids']))
+    found = set(targets.filter(pk__in=ids).values_list('pk', flat=True))
+    links = model.objects.filter(
+        user=request.user,
+        **{f'{field}_id__in': found}
+    )
+    linked = set(links.values_list(f'{field}_id', flat=True))
+    if request.method == 'POST':
+        changed = found - linked
+        model.objects.bulk_create(
+            (
+                model(user=request.user, **{f'{field}_id': pk})
+                for pk in changed
+            ),
+            ignore_conflicts=True
+        )
+    else:
+        changed = linked
+        links.delete()
+    done, unchanged = BULK_STATUSES[request.method]
+    return changed, [
+        {
+            'id': pk,
+            'status': (
+                done if pk in changed
+                else unchanged if pk in found
+                else 'not_found'
+            )
+        }
+        for pk in ids
+    ]
 
 
 class IngredientsViewSet(viewsets.ModelViewSet):
     queryset = Ingredients.objects.all()
     serializer_class = IngredientsSerializer
     permission_classes = (AdminOrReadOnly,)
-    filter_backends = (DjangoFilterBackend, filters.SearchFilter,)
+    filter_backends = (DjangoFilterBackend, TrigramSearchFilter,)
     filterset_class = IngredientNameFilter
+    search_fields = ('name',)
+
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if name is None:
+            return super().list(request, *args, **kwargs)
+        return Response(ingredient_index.search(
+            name,
+            request.query_params.get('measurement_unit')
+        ))
 
 
 class TagViewSet(viewsets.ReadOnlyModelViewSet):
@@ -37,40 +110,157 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = TagSerializer
     permission_classes = (AdminOrReadOnly,)
 
+    @staticmethod
+    def __cached_response(request, data, etag):
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = Response(status=HTTPStatus.NOT_MODIFIED)
+        else:
+            response = Response(data)
+        response['ETag'] = etag
+        response['Cache-Control'] = (
+            f'public, max-age={settings.TAGS_CACHE_MAX_AGE}'
+        )
+        return response
+
+    def list(self, request, *args, **kwargs):
+        data, _, etag = tag_list_cache.get()
+        return self.__cached_response(request, data, etag)
+
+    def retrieve(self, request, *args, **kwargs):
+        _, by_id, etag = tag_list_cache.get()
+        tag = by_id.get(int(kwargs['pk'])) if kwargs['pk'].isdigit() else None
+        if tag is None:
+            raise Http404
+        return self.__cached_response(request, tag, etag)
+
 
 class RecipesViewSet(viewsets.ModelViewSet):
-    queryset = Recipe.objects.all()
+    queryset = Recipe.objects.select_related('author')
     permission_classes = (AuthorOrReadOnly,)
-    pagination_class = CustomPagination
+    pagination_class = RecipePagination
     filter_backends = (DjangoFilterBackend,)
     filter_class = RecipeFilter
 
+    def get_queryset(self):
+        return super().get_queryset().with_user_flags(self.request.user)
+
     def get_serializer_class(self):
         if self.request.method in SAFE_METHODS:
             return RecipeSerializer
         return RecipeCreateUpdateSerializer
 
+    @staticmethod
+    def __etag(data):
+        return '"{}"'.format(hashlib.sha1(json.dumps(
+            data, sort_keys=True, cls=DjangoJSONEncoder
+        ).encode()).hexdigest())
+
+    @staticmethod
+    def __conditional(request, etag, last_modified, build_response):
+        """304 по совпадению ETag, иначе полный ответ.
+
+        Last-Modified отдаётся только для справки: счётчики, данные автора
+        и флаги пользователя меняются без updated_at, поэтому решение
+        принимается по ETag, в который они входят.
+        """
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = Response(status=HTTPStatus.NOT_MODIFIED)
+        else:
+            response = build_response()
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified.timestamp())
+        patch_cache_control(response, no_cache=True)
+        patch_vary_headers(response, ('Authorization',))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = self.paginate_queryset(queryset.validators(request.user))
+        etag = self.__etag(self.get_paginated_response(rows).data)
+
+        def build_response():
+            recipes = queryset.in_bulk([row['id'] for row in rows])
+            serializer = self.get_serializer(
+                [recipes[row['id']] for row in rows if row['id'] in recipes],
+                many=True
+            )
+            return self.get_paginated_response(serializer.data)
+
+        return self.__conditional(
+            request,
+            etag,
+            max((row['updated_at'] for row in rows), default=None),
+            build_response
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = str(kwargs['pk'])
+        row = self.get_queryset().filter(pk=pk).validators(
+            request.user
+        ).first() if pk.isdigit() else None
+        if row is None:
+            raise Http404
+        return self.__conditional(
+            request,
+            self.__etag(row),
+            row['updated_at'],
+            lambda: super(RecipesViewSet, self).retrieve(
+                request, *args, **kwargs
+            )
+        )
+
+    @transaction.atomic
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
-    @staticmethod
-    def __add_recipe(model, request, pk):
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        instance.delete()
+        delete_recipe_image.delay(image=instance.image.name)
+
+    def __add_recipe(self, model, request, pk):
         recipe = get_object_or_404(Recipe, id=pk)
         model.objects.create(recipe=recipe, user=request.user)
+        if model is ShoppingList:
+            ShoppingCartIngredient.objects.add_recipe(request.user, recipe)
         serializer = RecipeMinifiedSerializer(recipe)
         return Response(data=serializer.data, status=HTTPStatus.CREATED)
 
-    @staticmethod
-    def __delete_recipe(model, request, pk):
+    def __delete_recipe(self, model, request, pk):
         recipe = get_object_or_404(Recipe, id=pk)
-        model.objects.filter(recipe=recipe, user=request.user).delete()
+        deleted, _ = model.objects.filter(
+            recipe=recipe,
+            user=request.user
+        ).delete()
+        if deleted and model is ShoppingList:
+            ShoppingCartIngredient.objects.remove_recipe(request.user, recipe)
         return Response(status=HTTPStatus.NO_CONTENT)
 
+    def __bulk_recipes(self, model, request):
+        changed, results = bulk_change(
+            request, model, 'recipe', Recipe.objects.all()
+        )
+        if changed:
+            sign = 1 if request.method == 'POST' else -1
+            if sign > 0:
+                # bulk_create не вызывает сигналы, счётчик меняется здесь
+                counter = RECIPE_COUNTERS[model]
+                Recipe.objects.filter(pk__in=changed).update(
+                    **{counter: F(counter) + 1}
+                )
+            if model is ShoppingList:
+                ShoppingCartIngredient.objects.add_recipes(
+                    request.user, changed, sign
+                )
+        return Response({'results': results})
+
     @action(
         methods=['POST', 'DELETE'],
         detail=True,
         permission_classes=(IsAuthenticated,)
     )
+    @transaction.atomic
     def favorite(self, request, pk=None):
         if request.method == 'POST':
             return self.__add_recipe(FavoriteRecipes, request, pk)
@@ -91,25 +281,57 @@ class RecipesViewSet(viewsets.ModelViewSet):
         detail=True,
         permission_classes=(IsAuthenticated,)
     )
+    @transaction.atomic
     def shopping_cart(self, request, pk):
         if request.method == 'POST':
             return self.__add_recipe(ShoppingList, request, pk)
         return self.__delete_recipe(ShoppingList, request, pk)
 
     @action(
-        methods=['GET'],
+        methods=['POST', 'DELETE'],
         detail=False,
+        url_path='favorite',
         permission_classes=(IsAuthenticated,)
     )
+    @transaction.atomic
+    def favorite_bulk(self, request):
+        return self.__bulk_recipes(FavoriteRecipes, request)
+
+    @action(
+        methods=['POST', 'DELETE'],
+        detail=False,
+        url_path='shopping_cart',
+        permission_classes=(IsAuthenticated,)
+    )
+    @transaction.atomic
+    def shopping_cart_bulk(self, request):
+        return self.__bulk_recipes(ShoppingList, request)
+
+    @action(
+        methods=['GET'],
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+        content_negotiation_class=IgnoreFormatNegotiation
+    )
     def download_shopping_cart(self, request):
         user = request.user
-        return get_ingredients_for_shopping(user)
+        file_format = request.query_params.get('format', 'txt')
+        if file_format not in SHOPPING_LIST_FORMATS:
+            return Response(
+                {'format': [
+                    'Допустимые форматы: '
+                    f'{", ".join(SHOPPING_LIST_FORMATS)}'
+                ]},
+                status=HTTPStatus.BAD_REQUEST
+            )
+        return get_ingredients_for_shopping(user, file_format)
 
 
 class CustomUserViewSet(UserViewSet):
     queryset = User.objects.all()
     pagination_class = CustomPagination
     serializer_class = UserSerializer
+    filter_backends = (TrigramSearchFilter,)
     search_fields = ('username', 'email')
     permission_classes = (AllowAny,)
 
@@ -125,7 +347,23 @@ class CustomUserViewSet(UserViewSet):
     )
     def subscriptions(self, request):
         user = request.user
-        queryset = Follow.objects.filter(user=user)
+        recipes = Recipe.objects.order_by('-pub_date', '-id')
+        limit = request.query_params.get('recipes_limit')
+        if limit is not None and limit.isdigit():
+            recipes = recipes.filter(pk__in=Subquery(
+                Recipe.objects.filter(
+                    author=OuterRef('author')
+                ).order_by('-pub_date', '-id').values('pk')[:int(limit)]
+            ))
+        queryset = Follow.objects.filter(user=user).select_related(
+            'author'
+        ).prefetch_related(
+            Prefetch(
+                'author__author_recipe',
+                queryset=recipes,
+                to_attr='subscription_recipes'
+            )
+        ).order_by('id')
         pages = self.paginate_queryset(queryset)
         serializer = UserWithRecipesSerializer(
             pages,
@@ -139,14 +377,16 @@ class CustomUserViewSet(UserViewSet):
         detail=True,
         permission_classes=[IsAuthenticated]
     )
+    @transaction.atomic
     def subscribe(self, request, id):
         author = get_object_or_404(User, id=id)
         if request.method == 'POST':
-            serializer = FollowSerializer(
-                Follow.objects.create(
-                    user=request.user,
-                    author=author
-                ),
+            follow = Follow.objects.create(
+                user=request.user,
+                author=author
+            )
+            serializer = UserWithRecipesSerializer(
+                follow,
                 context={'request': request},
             )
             return Response(
@@ -158,3 +398,24 @@ class CustomUserViewSet(UserViewSet):
             author=author
         ).delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(
+        methods=['POST', 'DELETE'],
+        detail=False,
+        url_path='subscribe',
+        permission_classes=(IsAuthenticated,)
+    )
+    @transaction.atomic
+    def subscribe_bulk(self, request):
+        changed, results = bulk_change(
+            request,
+            Follow,
+            'author',
+            User.objects.exclude(pk=request.user.pk)
+        )
+        if changed and request.method == 'POST':
+            # bulk_create не вызывает сигналы, счётчик меняется здесь
+            User.objects.filter(pk__in=changed).update(
+                followers_count=F('followers_count') + 1
+            )
+        return Response({'results': results})
@@ -0,0 +1,45 @@
+import threading
+import time
+
+from django.conf import settings
+
+
+class ProcessCache:
+    """Данные из БД, собранные один раз и хранящиеся в памяти процесса.
+
+    Пока данные свежие, get() не обращается к БД. Сигналы изменения
+    моделей вызывают invalidate() и пересборку в этом процессе; изменения
+    из других процессов, из команд загрузки и через QuerySet.update()
+    подхватываются не позже чем через ttl_setting секунд.
+    """
+    ttl_setting = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._built_generation = None
+        self._built_at = None
+        self._value = None
+
+    def build(self):
+        raise NotImplementedError
+
+    def invalidate(self):
+        self._generation += 1
+
+    def _is_stale(self):
+        return (
+            self._built_generation != self._generation
+            or time.monotonic() - self._built_at
+            > getattr(settings, self.ttl_setting)
+        )
+
+    def get(self):
+        if self._is_stale():
+            with self._lock:
+                if self._is_stale():
+                    generation = self._generation
+                    self._value = self.build()
+                    self._built_at = time.monotonic()
+                    self._built_generation = generation
+        return self._value
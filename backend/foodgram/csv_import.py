@@ -0,0 +1,190 @@
+import csv
+import io
+import sys
+from contextlib import nullcontext
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+
+
+class CsvImportCommand(BaseCommand):
+    """Потоковая загрузка CSV пакетами через bulk_create.
+
+    Строки, которые уже есть в таблице, пропускаются (ignore_conflicts),
+    поэтому повторный запуск безопасен. На PostgreSQL пакет копируется
+    через COPY во временную таблицу и вставляется с ON CONFLICT DO NOTHING.
+    На других СУБД число добавленных строк считается по уникальным ключам
+    модели: уже существующие ключи пакета выбираются одним запросом.
+    """
+    model = None
+    fields = ()
+    default_path = None
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default=self.default_path,
+            help=f'Путь к CSV или - для stdin (по умолчанию '
+                 f'{self.default_path})'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество строк в одной вставке'
+        )
+        parser.add_argument(
+            '--delimiter',
+            default=',',
+            help='Разделитель полей'
+        )
+        parser.add_argument(
+            '--skip-header',
+            action='store_true',
+            help='Пропустить первую строку файла'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Загрузить в транзакции и откатить её'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            csv_file = (
+                sys.stdin if path == '-'
+                else open(path, 'r', encoding='UTF-8', newline='')
+            )
+        except FileNotFoundError:
+            raise CommandError(f'Файл {path} не найден')
+        self.stats = {'inserted': 0, 'skipped': 0, 'malformed': 0}
+        with csv_file if path != '-' else nullcontext():
+            reader = csv.reader(csv_file, delimiter=options['delimiter'])
+            if options['skip_header']:
+                next(reader, None)
+            self.load(reader, options['batch_size'], options['dry_run'])
+        self.stdout.write(
+            ('Пробный запуск. ' if options['dry_run'] else '')
+            + 'Добавлено: {inserted}, уже были: {skipped}, '
+              'с ошибками: {malformed}'.format(**self.stats)
+        )
+
+    def load(self, reader, batch_size, dry_run):
+        objects = self.parse(reader)
+        with transaction.atomic() if dry_run else nullcontext():
+            while True:
+                batch = list(islice(objects, batch_size))
+                if not batch:
+                    break
+                with transaction.atomic():
+                    inserted = self.insert(batch)
+                self.stats['inserted'] += inserted
+                self.stats['skipped'] += len(batch) - inserted
+            if dry_run:
+                transaction.set_rollback(True)
+
+    def parse(self, reader):
+        for line_number, row in enumerate(reader, 1):
+            if len(row) != len(self.fields):
+                self.malformed(line_number, row, 'неверное число полей')
+                continue
+            obj = self.model(**dict(zip(
+                self.fields,
+                (value.strip() for value in row)
+            )))
+            try:
+                obj.full_clean(validate_unique=False)
+            except ValidationError as error:
+                self.malformed(line_number, row, error.messages)
+                continue
+            yield obj
+
+    def malformed(self, line_number, row, reason):
+        self.stats['malformed'] += 1
+        if self.verbosity > 1:
+            self.stderr.write(f'Строка {line_number}: {row} - {reason}')
+
+    def execute(self, *args, **options):
+        self.verbosity = options.get('verbosity', 1)
+        return super().execute(*args, **options)
+
+    def insert(self, batch):
+        if connection.vendor == 'postgresql':
+            return self.copy_insert(batch)
+        batch = self.new_objects(batch)
+        self.model.objects.bulk_create(batch, ignore_conflicts=True)
+        return len(batch)
+
+    def unique_keys(self):
+        meta = self.model._meta
+        keys = [
+            (field.name,) for field in meta.local_fields
+            if field.unique and field.name in self.fields
+        ]
+        keys += [
+            tuple(constraint.fields)
+            for constraint in meta.total_unique_constraints
+            if set(constraint.fields) <= set(self.fields)
+        ]
+        return keys
+
+    def new_objects(self, batch):
+        """Строки пакета, которые не конфликтуют с таблицей и друг с другом"""
+        keys = self.unique_keys()
+        if not keys:
+            return batch
+        condition = Q()
+        for key in keys:
+            condition |= Q(**{
+                f'{name}__in': {getattr(obj, name) for obj in batch}
+                for name in key
+            })
+        names = sorted({name for key in keys for name in key})
+        seen = set()
+        for row in self.model.objects.filter(condition).values(*names):
+            seen.update(
+                (key, tuple(row[name] for name in key)) for key in keys
+            )
+        new = []
+        for obj in batch:
+            values = {
+                (key, tuple(getattr(obj, name) for name in key))
+                for key in keys
+            }
+            if seen.isdisjoint(values):
+                new.append(obj)
+            seen.update(values)
+        return new
+
+    def copy_insert(self, batch):
+        table = self.model._meta.db_table
+        staging = f'{table}_import'
+        columns = ', '.join(
+            connection.ops.quote_name(self.model._meta.get_field(name).column)
+            for name in self.fields
+        )
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(
+            [getattr(obj, name) for name in self.fields] for obj in batch
+        )
+        buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMP TABLE IF NOT EXISTS {staging} '
+                f'AS SELECT {columns} FROM {table} WITH NO DATA'
+            )
+            cursor.execute(f'TRUNCATE {staging}')
+            cursor.copy_expert(
+                f'COPY {staging} ({columns}) FROM STDIN WITH (FORMAT csv)',
+                buffer
+            )
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) '
+                f'SELECT {columns} FROM {staging} ON CONFLICT DO NOTHING'
+            )
+            return cursor.rowcount
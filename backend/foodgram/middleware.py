@@ -0,0 +1,149 @@
+import hashlib
+import json
+import logging
+import re
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger('foodgram.slow_requests')
+
+IN_LIST = re.compile(r'\bIN \((?:%s, )*%s\)')
+NUMBER = re.compile(r'\b\d+\b')
+SPACES = re.compile(r'\s+')
+MAX_SQL_LENGTH = 500
+
+
+def fingerprint(sql):
+    """Текст запроса без конкретных значений и длины списков IN"""
+    sql = IN_LIST.sub('IN (...)', SPACES.sub(' ', sql))
+    return NUMBER.sub('?', sql)
+
+
+class RequestQueries:
+    """Обёртка execute: считает запросы и время БД одного HTTP-запроса"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.by_sql = defaultdict(lambda: [0, 0.0])
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.count += 1
+            self.duration += duration
+            stats = self.by_sql[sql]
+            stats[0] += 1
+            stats[1] += duration
+
+    def mark(self):
+        return time.perf_counter(), self.duration
+
+    def fingerprints(self):
+        counts, durations = Counter(), Counter()
+        for sql, (count, duration) in self.by_sql.items():
+            key = fingerprint(sql)
+            counts[key] += count
+            durations[key] += duration
+        return [
+            {
+                'id': hashlib.sha1(key.encode()).hexdigest()[:12],
+                'sql': key[:MAX_SQL_LENGTH],
+                'count': count,
+                'ms': round(durations[key] * 1000, 2),
+            }
+            for key, count in counts.most_common()
+        ]
+
+
+def elapsed(start, end):
+    """Время между отметками за вычетом времени БД, в мс"""
+    return max(0.0, (end[0] - start[0]) - (end[1] - start[1])) * 1000
+
+
+class QueryInstrumentationMiddleware:
+    """Счётчик SQL-запросов, заголовок Server-Timing и журнал медленных
+    запросов.
+
+    Включается настройкой SQL_INSTRUMENTATION; когда она выключена,
+    Django исключает middleware из цепочки и накладных расходов нет.
+    Запросы, выполняемые при чтении потокового ответа, не учитываются.
+    """
+
+    def __init__(self, get_response):
+        if not settings.SQL_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request._queries = queries = RequestQueries()
+        request._query_marks = marks = {'start': queries.mark()}
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(
+                    connections[alias].execute_wrapper(queries)
+                )
+            response = self.get_response(request)
+        marks['end'] = queries.mark()
+        marks.setdefault('view_start', marks['start'])
+        marks.setdefault('view_end', marks['end'])
+        marks.setdefault('render_end', marks['view_end'])
+        timings = {
+            'db': queries.duration * 1000,
+            'serialize': elapsed(marks['view_start'], marks['view_end']),
+            'render': elapsed(marks['view_end'], marks['render_end']),
+            'total': (marks['end'][0] - marks['start'][0]) * 1000,
+        }
+        response['Server-Timing'] = ', '.join(
+            f'{name};dur={duration:.1f}'
+            + (f';desc="{queries.count} queries"' if name == 'db' else '')
+            for name, duration in timings.items()
+        )
+        self.log_slow(request, response, queries, timings)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._query_marks['view_start'] = request._queries.mark()
+
+    def process_template_response(self, request, response):
+        marks = request._query_marks
+        marks['view_end'] = request._queries.mark()
+
+        def rendered(response):
+            marks['render_end'] = request._queries.mark()
+
+        response.add_post_render_callback(rendered)
+        return response
+
+    def log_slow(self, request, response, queries, timings):
+        fingerprints = queries.fingerprints()
+        repeated = [
+            item for item in fingerprints
+            if item['count'] >= settings.SLOW_REQUEST_REPEATED_SQL
+        ]
+        if (
+            timings['total'] < settings.SLOW_REQUEST_MS
+            and queries.count < settings.SLOW_REQUEST_QUERIES
+            and not repeated
+        ):
+            return
+        logger.warning(json.dumps({
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'queries': queries.count,
+            **{
+                f'{name}_ms': round(duration, 1)
+                for name, duration in timings.items()
+            },
+            'repeated': repeated,
+            'top': fingerprints[:settings.SLOW_REQUEST_TOP_SQL],
+        }, ensure_ascii=False))
@@ -0,0 +1,44 @@
+from django.db.migrations.operations.base import Operation
+
+
+class AddPostgresIndexesConcurrently(Operation):
+    """CREATE INDEX CONCURRENTLY по SQL-определениям, только на PostgreSQL.
+
+    Для функциональных индексов с классом операторов, например
+    UPPER(name) gin_trgm_ops: в Django 3.2 их нельзя описать через
+    models.Index (OpClass появился в 4.1), поэтому AddIndexConcurrently
+    не подходит. Состояние моделей не меняется; миграция с этой операцией
+    должна быть atomic = False.
+    """
+    reversible = True
+
+    def __init__(self, indexes):
+        self.indexes = indexes
+
+    def deconstruct(self):
+        return self.__class__.__name__, [self.indexes], {}
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for name, definition in self.indexes.items():
+            schema_editor.execute(
+                f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} '
+                f'ON {definition}'
+            )
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for name in self.indexes:
+            schema_editor.execute(
+                f'DROP INDEX CONCURRENTLY IF EXISTS {name}'
+            )
+
+    def describe(self):
+        return f'Create PostgreSQL indexes {", ".join(self.indexes)}'
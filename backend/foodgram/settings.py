@@ -30,12 +30,14 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'sorl.thumbnail',
     'api.apps.ApiConfig',
     'ingredients.apps.IngredientsConfig',
     'recipes.apps.RecipesConfig',
     'tags.apps.TagsConfig',
     'users.apps.UsersConfig',
+    'jobs.apps.JobsConfig',
     'rest_framework',
     'rest_framework.authtoken',
     'djoser',
@@ -53,6 +55,7 @@ REST_FRAMEWORK = {
 
 
 MIDDLEWARE = [
+    'foodgram.middleware.QueryInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -157,4 +160,79 @@ AUTH_USER_MODEL = 'users.User'
 
 SHOPPING_LIST_FILENAME = 'shopping_list.txt'
 
+SHOPPING_LIST_CHUNK_SIZE = 500
+
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    'SHOPPING_LIST_PDF_FONT',
+    default='/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
 PAGINATION_PAGE_SIZE = 6
+
+BULK_MAX_IDS = 100
+
+INGREDIENTS_INDEX_TTL = 300
+
+TAGS_CACHE_TTL = 300
+
+TAGS_CACHE_MAX_AGE = 60
+
+RECIPE_CACHE_TTL = 24 * 60 * 60
+
+RECIPE_IMAGE_VARIANTS = {
+    'thumbnail': {'geometry': '160x160', 'crop': 'center'},
+    'card': {'geometry': '480x320', 'crop': 'center'},
+    'full': {'geometry': '1280x1280', 'upscale': False},
+}
+
+RECIPE_IMAGE_FORMATS = ('JPEG', 'WEBP')
+
+THUMBNAIL_QUALITY = 80
+
+JOBS_EAGER = os.getenv('JOBS_EAGER', 'False') == 'True'
+
+JOBS_WORKERS = int(os.getenv('JOBS_WORKERS', 2))
+
+JOBS_POLL_INTERVAL = 1.0
+
+JOBS_MAX_ATTEMPTS = 5
+
+JOBS_RETRY_DELAY = 10
+
+JOBS_RETRY_MAX_DELAY = 3600
+
+JOBS_LOCK_TIMEOUT = 600
+
+JOBS_DONE_TTL = 24 * 60 * 60
+
+SQL_INSTRUMENTATION = os.getenv('SQL_INSTRUMENTATION', 'False') == 'True'
+
+SLOW_REQUEST_MS = int(os.getenv('SLOW_REQUEST_MS', 500))
+
+SLOW_REQUEST_QUERIES = int(os.getenv('SLOW_REQUEST_QUERIES', 30))
+
+SLOW_REQUEST_REPEATED_SQL = int(os.getenv('SLOW_REQUEST_REPEATED_SQL', 10))
+
+SLOW_REQUEST_TOP_SQL = 5
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'foodgram.slow_requests': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+        'jobs': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class IngredientsConfig(AppConfig):
     name = 'ingredients'
     verbose_name = 'Ингредиенты'
+
+    def ready(self):
+        from . import signals  # noqa: F401
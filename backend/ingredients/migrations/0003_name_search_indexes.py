@@ -0,0 +1,26 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+from foodgram.operations import AddPostgresIndexesConcurrently
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('ingredients', '0002_auto_20221020_1016'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        AddPostgresIndexesConcurrently({
+            'ingredients_name_upper_like': (
+                'ingredients_ingredients '
+                '(UPPER("name"::text) text_pattern_ops)'
+            ),
+            'ingredients_name_upper_trgm': (
+                'ingredients_ingredients '
+                'USING gin (UPPER("name"::text) gin_trgm_ops)'
+            ),
+        }),
+    ]
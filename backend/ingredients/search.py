@@ -0,0 +1,41 @@
+from bisect import bisect_left
+
+from foodgram.caches import ProcessCache
+
+from .models import Ingredients
+
+
+class IngredientIndex(ProcessCache):
+    """Отсортированный индекс названий ингредиентов в памяти процесса.
+
+    Сначала отдаются совпадения по началу названия, затем по подстроке.
+    Поиск по прогретому индексу не делает запросов к БД.
+    """
+    ttl_setting = 'INGREDIENTS_INDEX_TTL'
+
+    def build(self):
+        rows = sorted(
+            Ingredients.objects.values('id', 'name', 'measurement_unit'),
+            key=lambda row: (row['name'].casefold(), row['id'])
+        )
+        return [row['name'].casefold() for row in rows], rows
+
+    def search(self, name, measurement_unit=None):
+        keys, rows = self.get()
+        name = name.casefold()
+        start = bisect_left(keys, name)
+        end = bisect_left(keys, name + chr(0x10FFFF), lo=start)
+        found = rows[start:end] + [
+            rows[position]
+            for position, key in enumerate(keys)
+            if name in key and not start <= position < end
+        ]
+        if measurement_unit is not None:
+            found = [
+                row for row in found
+                if row['measurement_unit'] == measurement_unit
+            ]
+        return found
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,36 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import Job
+
+
+@admin.action(description='Перезапустить')
+def retry_jobs(modeladmin, request, queryset):
+    queryset.update(
+        status=Job.PENDING,
+        run_at=timezone.now(),
+        attempts=0,
+        locked_at=None,
+        locked_by=''
+    )
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = (
+        'id',
+        'task',
+        'status',
+        'attempts',
+        'max_attempts',
+        'run_at',
+        'locked_by',
+        'created_at'
+    )
+    search_fields = ('task',)
+    list_filter = ('status', 'task')
+    readonly_fields = ('locked_at', 'locked_by', 'last_error', 'created_at')
+    actions = (retry_jobs,)
+    empty_value_display = '-пусто-'
+
+
+admin.site.register(Job, JobAdmin)
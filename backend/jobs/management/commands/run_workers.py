@@ -0,0 +1,106 @@
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.queue import run_job
+
+
+def work(name, options, stop):
+    """Цикл одного воркера: забрать задачи, выполнить, подождать"""
+    if options['pool'] == 'process':
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        while not stop.is_set():
+            close_old_connections()
+            jobs = Job.objects.claim(name, options['batch_size'])
+            for job in jobs:
+                run_job(job)
+            if not jobs:
+                if options['burst']:
+                    break
+                stop.wait(options['poll_interval'])
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Запуск воркеров очереди фоновых задач'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.JOBS_WORKERS,
+            help='Количество воркеров'
+        )
+        parser.add_argument(
+            '--pool',
+            choices=('thread', 'process'),
+            default='thread',
+            help='Воркеры-потоки или воркеры-процессы'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=settings.JOBS_POLL_INTERVAL,
+            help='Пауза между опросами пустой очереди, в секундах'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10,
+            help='Сколько задач воркер забирает за раз'
+        )
+        parser.add_argument(
+            '--burst',
+            action='store_true',
+            help='Завершиться, когда очередь опустеет'
+        )
+
+    def handle(self, *args, **options):
+        deleted, _ = Job.objects.filter(
+            status=Job.DONE,
+            created_at__lt=timezone.now() - timedelta(
+                seconds=settings.JOBS_DONE_TTL
+            )
+        ).delete()
+        if deleted:
+            self.stdout.write(f'Удалено выполненных задач: {deleted}')
+        if options['pool'] == 'process':
+            connections.close_all()
+            context = multiprocessing.get_context('fork')
+            stop, start = context.Event(), context.Process
+        else:
+            stop, start = threading.Event(), threading.Thread
+        prefix = f'{socket.gethostname()}:{os.getpid()}'
+        workers = [
+            start(
+                target=work,
+                args=(f'{prefix}:{number}', options, stop),
+                name=f'worker-{number}'
+            )
+            for number in range(options['workers'])
+        ]
+        signal.signal(signal.SIGTERM, lambda *args: stop.set())
+        for worker in workers:
+            worker.start()
+        self.stdout.write(
+            f'Запущено воркеров: {len(workers)} ({options["pool"]})'
+        )
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            stop.set()
+            for worker in workers:
+                worker.join()
+        self.stdout.write('Воркеры остановлены')
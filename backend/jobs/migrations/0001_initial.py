@@ -0,0 +1,40 @@
+# Generated by Django 3.2.15 on 2026-10-18 03:32
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task', models.CharField(help_text='Имя зарегистрированной задачи', max_length=200, verbose_name='Задача')),
+                ('kwargs', models.JSONField(blank=True, default=dict, help_text='Аргументы задачи', verbose_name='Аргументы')),
+                ('status', models.CharField(choices=[('pending', 'Ожидает'), ('running', 'Выполняется'), ('done', 'Выполнена'), ('failed', 'Ошибка')], default='pending', help_text='Статус', max_length=10, verbose_name='Статус')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, help_text='Сколько раз задача запускалась', verbose_name='Попыток')),
+                ('max_attempts', models.PositiveSmallIntegerField(default=5, help_text='Максимум попыток', verbose_name='Максимум попыток')),
+                ('run_at', models.DateTimeField(default=django.utils.timezone.now, help_text='Запустить не раньше', verbose_name='Запустить не раньше')),
+                ('locked_at', models.DateTimeField(blank=True, help_text='Взята в работу', null=True, verbose_name='Взята в работу')),
+                ('locked_by', models.CharField(blank=True, help_text='Воркер', max_length=100, verbose_name='Воркер')),
+                ('last_error', models.TextField(blank=True, help_text='Последняя ошибка', verbose_name='Последняя ошибка')),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='Создана', verbose_name='Создана')),
+            ],
+            options={
+                'verbose_name': 'Фоновая задача',
+                'verbose_name_plural': 'Фоновые задачи',
+                'ordering': ['-id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['status', 'run_at'], name='job_status_run_at_idx'),
+        ),
+    ]
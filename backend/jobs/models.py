@@ -0,0 +1,163 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.db.models import F
+from django.utils import timezone
+
+
+class JobQuerySet(models.QuerySet):
+
+    def stale(self):
+        """Выполняемые задачи, чей воркер не отчитался за JOBS_LOCK_TIMEOUT"""
+        return self.filter(
+            status=Job.RUNNING,
+            locked_at__lt=timezone.now() - timedelta(
+                seconds=settings.JOBS_LOCK_TIMEOUT
+            )
+        )
+
+    def ready(self):
+        """Задачи, которые пора выполнить, и зависшие у упавших воркеров.
+
+        Зависшая задача берётся повторно, только пока не исчерпаны
+        попытки: иначе задача, которая роняет воркер, забиралась бы
+        бесконечно.
+        """
+        return (
+            self.filter(status=Job.PENDING, run_at__lte=timezone.now())
+            | self.stale()
+        ).filter(attempts__lt=F('max_attempts')).order_by('run_at', 'id')
+
+    def fail_exhausted(self):
+        """Помечает ошибкой зависшие задачи без оставшихся попыток"""
+        return self.stale().filter(attempts__gte=F('max_attempts')).update(
+            status=Job.FAILED,
+            locked_at=None,
+            locked_by='',
+            last_error=(
+                'Воркер не завершил задачу за '
+                f'{settings.JOBS_LOCK_TIMEOUT} с, попытки исчерпаны'
+            )
+        )
+
+    def claim(self, worker, limit=1):
+        """Забирает до limit задач для воркера.
+
+        На PostgreSQL строки блокируются SELECT ... FOR UPDATE SKIP LOCKED,
+        поэтому воркеры не ждут друг друга. Где SKIP LOCKED нет (SQLite),
+        задача забирается условным UPDATE: её получает тот, чей UPDATE
+        изменил строку. Перед этим зависшие задачи без попыток
+        помечаются ошибкой.
+        """
+        self.fail_exhausted()
+        if connection.features.has_select_for_update_skip_locked:
+            with transaction.atomic():
+                pks = list(self.ready().select_for_update(
+                    skip_locked=True
+                ).values_list('pk', flat=True)[:limit])
+                self.filter(pk__in=pks).update(**self._lock(worker))
+        else:
+            pks = []
+            for job in self.ready().values('pk', 'status', 'locked_at')[
+                :limit
+            ]:
+                if self.filter(**job).update(**self._lock(worker)):
+                    pks.append(job['pk'])
+        return list(self.filter(pk__in=pks, locked_by=worker).order_by(
+            'run_at', 'id'
+        ))
+
+    @staticmethod
+    def _lock(worker):
+        return {
+            'status': Job.RUNNING,
+            'locked_at': timezone.now(),
+            'locked_by': worker,
+            'attempts': F('attempts') + 1,
+        }
+
+
+class Job(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'Ожидает'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    )
+
+    task = models.CharField(
+        max_length=200,
+        verbose_name='Задача',
+        help_text='Имя зарегистрированной задачи'
+    )
+    kwargs = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name='Аргументы',
+        help_text='Аргументы задачи'
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUSES,
+        default=PENDING,
+        verbose_name='Статус',
+        help_text='Статус'
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Попыток',
+        help_text='Сколько раз задача запускалась'
+    )
+    max_attempts = models.PositiveSmallIntegerField(
+        default=5,
+        verbose_name='Максимум попыток',
+        help_text='Максимум попыток'
+    )
+    run_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Запустить не раньше',
+        help_text='Запустить не раньше'
+    )
+    locked_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Взята в работу',
+        help_text='Взята в работу'
+    )
+    locked_by = models.CharField(
+        max_length=100,
+        blank=True,
+        verbose_name='Воркер',
+        help_text='Воркер'
+    )
+    last_error = models.TextField(
+        blank=True,
+        verbose_name='Последняя ошибка',
+        help_text='Последняя ошибка'
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Создана',
+        help_text='Создана'
+    )
+
+    objects = JobQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['status', 'run_at'],
+                name='job_status_run_at_idx'
+            )
+        ]
+        ordering = ['-id']
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+
+    def __str__(self):
+        return f'{self.task} ({self.get_status_display()})'
@@ -0,0 +1,84 @@
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger('jobs')
+
+TASKS = {}
+
+
+def task(func=None, max_attempts=None):
+    """Регистрирует функцию как фоновую задачу.
+
+    У функции появляется метод delay(**kwargs), который ставит её вызов
+    в очередь. Аргументы должны сериализоваться в JSON.
+    """
+    def register(func):
+        name = f'{func.__module__}.{func.__name__}'
+        TASKS[name] = func
+        func.delay = lambda **kwargs: enqueue(
+            name, kwargs, max_attempts=max_attempts
+        )
+        return func
+    return register(func) if func is not None else register
+
+
+def enqueue(name, kwargs=None, delay=0, max_attempts=None):
+    """Ставит задачу в очередь в текущей транзакции.
+
+    Воркер увидит задачу только после коммита, поэтому она не начнёт
+    выполняться раньше, чем сохранятся данные запроса. При JOBS_EAGER
+    задача выполняется сразу после коммита в этом же процессе.
+    """
+    kwargs = kwargs or {}
+    if name not in TASKS:
+        raise LookupError(f'Задача {name} не зарегистрирована')
+    if settings.JOBS_EAGER:
+        transaction.on_commit(lambda: TASKS[name](**kwargs))
+        return None
+    return Job.objects.create(
+        task=name,
+        kwargs=kwargs,
+        run_at=timezone.now() + timedelta(seconds=delay),
+        max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS
+    )
+
+
+def retry_delay(attempts):
+    """Экспоненциальная задержка перед следующей попыткой, в секундах"""
+    return min(
+        settings.JOBS_RETRY_MAX_DELAY,
+        settings.JOBS_RETRY_DELAY * 2 ** max(attempts - 1, 0)
+    )
+
+
+def run_job(job):
+    """Выполняет взятую воркером задачу и записывает результат"""
+    unlocked = {'locked_at': None, 'locked_by': ''}
+    try:
+        if job.task not in TASKS:
+            raise LookupError(f'Задача {job.task} не зарегистрирована')
+        TASKS[job.task](**job.kwargs)
+    except Exception:
+        retry = job.attempts < job.max_attempts
+        logger.exception(
+            'Задача %s (%s) упала, попытка %s из %s',
+            job.pk, job.task, job.attempts, job.max_attempts
+        )
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.PENDING if retry else Job.FAILED,
+            run_at=timezone.now() + timedelta(
+                seconds=retry_delay(job.attempts)
+            ),
+            last_error=traceback.format_exc(),
+            **unlocked
+        )
+        return False
+    Job.objects.filter(pk=job.pk).update(status=Job.DONE, **unlocked)
+    return True
@@ -1,6 +1,8 @@
 from django.contrib import admin
+from django.db import transaction
 
-from .models import FavoriteRecipes, IngredientInRecipe, Recipe, ShoppingList
+from .models import (FavoriteRecipes, IngredientInRecipe, Recipe,
+                     ShoppingCartIngredient, ShoppingList)
 
 
 class IngredientsInRecipeInline(admin.TabularInline):
@@ -71,8 +73,43 @@ class ShoppingListAdmin(admin.ModelAdmin):
     list_filter = ('user', 'recipe',)
     empty_value_display = '-пусто-'
 
+    @transaction.atomic
+    def save_model(self, request, obj, form, change):
+        if change:
+            old = ShoppingList.objects.get(pk=obj.pk)
+            ShoppingCartIngredient.objects.remove_recipe(
+                old.user, old.recipe
+            )
+        super().save_model(request, obj, form, change)
+        ShoppingCartIngredient.objects.add_recipe(obj.user, obj.recipe)
+
+    @transaction.atomic
+    def delete_model(self, request, obj):
+        ShoppingCartIngredient.objects.remove_recipe(obj.user, obj.recipe)
+        super().delete_model(request, obj)
+
+    @transaction.atomic
+    def delete_queryset(self, request, queryset):
+        for item in queryset.select_related('user', 'recipe'):
+            ShoppingCartIngredient.objects.remove_recipe(
+                item.user, item.recipe
+            )
+        super().delete_queryset(request, queryset)
+
+
+class ShoppingCartIngredientAdmin(admin.ModelAdmin):
+    list_display = (
+        'user',
+        'ingredient',
+        'amount',
+    )
+    search_fields = ('user__username', 'ingredient__name',)
+    list_filter = ('user',)
+    empty_value_display = '-пусто-'
+
 
 admin.site.register(Recipe, RecipeAdmin)
 admin.site.register(IngredientInRecipe, IngredientInRecipeAdmin)
 admin.site.register(FavoriteRecipes, FavoriteRecipesAdmin)
 admin.site.register(ShoppingList, ShoppingListAdmin)
+admin.site.register(ShoppingCartIngredient, ShoppingCartIngredientAdmin)
@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.utils import timezone
+from sorl.thumbnail import get_thumbnail
+
+from .models import Recipe
+
+
+def build_image_variants(image):
+    """Уменьшенные копии фото рецепта во всех размерах и форматах"""
+    variants = {'source': image.name}
+    for name, options in settings.RECIPE_IMAGE_VARIANTS.items():
+        options = dict(options)
+        geometry = options.pop('geometry')
+        variants[name] = {
+            image_format.lower(): get_thumbnail(
+                image, geometry, format=image_format, **options
+            ).name
+            for image_format in settings.RECIPE_IMAGE_FORMATS
+        }
+    return variants
+
+
+def update_image_variants(recipe, force=False):
+    """Пересоздаёт варианты фото, если оно изменилось.
+
+    Возвращает True, если варианты были пересозданы.
+    """
+    if not recipe.image or not recipe.image.storage.exists(recipe.image.name):
+        return False
+    if not force and recipe.image_variants.get('source') == recipe.image.name:
+        return False
+    recipe.image_variants = build_image_variants(recipe.image)
+    recipe.updated_at = timezone.now()
+    Recipe.objects.filter(pk=recipe.pk).update(
+        image_variants=recipe.image_variants,
+        updated_at=recipe.updated_at
+    )
+    return True
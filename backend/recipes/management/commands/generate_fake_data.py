@@ -0,0 +1,302 @@
+import io
+import random
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+from PIL import Image
+
+from api.caches import tag_list_cache
+from ingredients.models import Ingredients
+from ingredients.search import ingredient_index
+from recipes.images import build_image_variants
+from recipes.models import (FavoriteRecipes, IngredientInRecipe, Recipe,
+                            ShoppingList, TagsRecipe)
+from tags.models import Tag
+from users.models import Follow, User
+
+PLACEHOLDER_COLORS = (
+    '#e57373', '#f06292', '#ba68c8', '#7986cb',
+    '#4fc3f7', '#4db6ac', '#aed581', '#ffb74d',
+)
+
+
+class Command(BaseCommand):
+    """Генерация синтетических данных.
+
+    --users, --recipes, --ingredients и --tags задают, сколько строк
+    добавить к уже существующим. Новые строки нумеруются от максимального
+    id таблицы, поэтому повторный запуск не пересекается с прежними
+    именами даже после удалений. Связи строятся только для новых
+    пользователей и рецептов, а ингредиенты и теги берутся из всего
+    каталога.
+    """
+    help = 'Генерация синтетических данных для нагрузочного тестирования'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=1000,
+            help='Сколько пользователей добавить'
+        )
+        parser.add_argument(
+            '--recipes',
+            type=int,
+            default=10000,
+            help='Сколько рецептов добавить'
+        )
+        parser.add_argument(
+            '--ingredients',
+            type=int,
+            default=0,
+            help='Сколько ингредиентов добавить в каталог'
+        )
+        parser.add_argument(
+            '--tags',
+            type=int,
+            default=0,
+            help='Сколько тегов добавить в каталог'
+        )
+        parser.add_argument(
+            '--zipf',
+            type=float,
+            default=1.1,
+            help='Показатель распределения Ципфа рецептов по авторам'
+        )
+        parser.add_argument(
+            '--ingredients-per-recipe',
+            type=int,
+            nargs=2,
+            default=(3, 12),
+            metavar=('MIN', 'MAX')
+        )
+        parser.add_argument(
+            '--tags-per-recipe',
+            type=int,
+            nargs=2,
+            default=(1, 3),
+            metavar=('MIN', 'MAX')
+        )
+        parser.add_argument(
+            '--follows',
+            type=float,
+            default=10,
+            help='Среднее число подписок пользователя'
+        )
+        parser.add_argument(
+            '--favorites',
+            type=float,
+            default=20,
+            help='Средний размер избранного'
+        )
+        parser.add_argument(
+            '--cart',
+            type=float,
+            default=5,
+            help='Средний размер списка покупок'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        ingredient_ids = self.make_ingredients(options['ingredients'])
+        tag_ids = self.make_tags(options['tags'])
+        if not ingredient_ids or not tag_ids:
+            self.stderr.write(
+                'Нужны ингредиенты и теги: загрузите их или '
+                'укажите --ingredients и --tags'
+            )
+            return
+        user_ids = self.make_users(options['users'])
+        author_weights = self.zipf_weights(len(user_ids), options['zipf'])
+        recipe_ids = self.make_recipes(
+            options['recipes'], user_ids, author_weights
+        )
+        self.make_recipe_links(
+            recipe_ids, tag_ids, options['tags_per_recipe'],
+            TagsRecipe, 'tag_id'
+        )
+        self.make_recipe_links(
+            recipe_ids, ingredient_ids, options['ingredients_per_recipe'],
+            IngredientInRecipe, 'ingredient_id'
+        )
+        self.make_follows(user_ids, author_weights, options['follows'])
+        self.make_user_recipes(
+            FavoriteRecipes, user_ids, recipe_ids, options['favorites']
+        )
+        self.make_user_recipes(
+            ShoppingList, user_ids, recipe_ids, options['cart']
+        )
+        call_command('rebuild_shopping_carts', stdout=self.stdout)
+        call_command('reconcile_counters', stdout=self.stdout)
+        ingredient_index.invalidate()
+        tag_list_cache.invalidate()
+        self.stdout.write(self.style.SUCCESS('Данные сгенерированы'))
+
+    def log(self, message):
+        self.stdout.write(message)
+
+    def zipf_weights(self, size, exponent):
+        weights = [1 / rank ** exponent for rank in range(1, size + 1)]
+        self.rng.shuffle(weights)
+        return list(accumulate(weights))
+
+    def count_around(self, mean, limit):
+        if mean <= 0:
+            return 0
+        return min(limit, round(self.rng.expovariate(1 / mean)))
+
+    @staticmethod
+    def next_number(model):
+        return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+    def insert(self, model, objects):
+        """bulk_create пакетами; возвращает id новых строк"""
+        last = model.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0
+        batch = []
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) >= self.batch_size:
+                model.objects.bulk_create(batch)
+                batch = []
+        model.objects.bulk_create(batch)
+        return list(model.objects.filter(pk__gt=last).order_by(
+            'pk'
+        ).values_list('pk', flat=True))
+
+    def make_ingredients(self, count):
+        if count > 0:
+            start = self.next_number(Ingredients)
+            self.insert(Ingredients, (
+                Ingredients(
+                    name=f'Ингредиент {start + number}',
+                    measurement_unit=self.rng.choice(('г', 'мл', 'шт.'))
+                )
+                for number in range(count)
+            ))
+            self.log(f'Ингредиентов добавлено: {count}')
+        return list(Ingredients.objects.values_list('pk', flat=True))
+
+    def make_tags(self, count):
+        if count > 0:
+            colors = set(Tag.objects.values_list('color', flat=True))
+            start = self.next_number(Tag)
+            tags = []
+            for number in range(start, start + count):
+                color = f'#{self.rng.randrange(0x1000000):06x}'
+                while color in colors:
+                    color = f'#{self.rng.randrange(0x1000000):06x}'
+                colors.add(color)
+                tags.append(Tag(
+                    name=f'Тег {number}',
+                    color=color,
+                    slug=f'tag-{number}'
+                ))
+            self.insert(Tag, tags)
+            self.log(f'Тегов добавлено: {count}')
+        return list(Tag.objects.values_list('pk', flat=True))
+
+    def make_users(self, count):
+        password = make_password('password')
+        start = self.next_number(User)
+        user_ids = self.insert(User, (
+            User(
+                username=f'user{start + number}',
+                email=f'user{start + number}@example.org',
+                first_name=f'Имя{start + number}',
+                last_name=f'Фамилия{start + number}',
+                password=password
+            )
+            for number in range(count)
+        ))
+        self.log(f'Пользователей добавлено: {len(user_ids)}')
+        return user_ids
+
+    def placeholder_images(self):
+        """Фото-заглушки и их копии: строятся один раз на каждую"""
+        images = []
+        for number, color in enumerate(PLACEHOLDER_COLORS):
+            name = f'recipes/placeholder_{number}.jpg'
+            if not default_storage.exists(name):
+                content = io.BytesIO()
+                Image.new('RGB', (480, 320), color).save(content, 'JPEG')
+                name = default_storage.save(
+                    name, ContentFile(content.getvalue())
+                )
+            images.append(
+                (name, build_image_variants(Recipe(image=name).image))
+            )
+        return images
+
+    def make_recipes(self, count, user_ids, author_weights):
+        images = self.placeholder_images()
+        start = self.next_number(Recipe)
+        authors = self.rng.choices(
+            user_ids, cum_weights=author_weights, k=count
+        )
+        recipe_ids = self.insert(Recipe, (
+            Recipe(
+                name=f'Рецепт {start + number}',
+                text=f'Описание рецепта {start + number}',
+                author_id=author,
+                image=image,
+                image_variants=variants,
+                cooking_time=self.rng.randint(5, 180)
+            )
+            for number, (author, (image, variants)) in enumerate(
+                zip(authors, self.rng.choices(images, k=count))
+            )
+        ))
+        self.log(f'Рецептов добавлено: {len(recipe_ids)}')
+        return recipe_ids
+
+    def make_recipe_links(self, recipe_ids, target_ids, bounds, model,
+                          field):
+        low, high = bounds
+        high = min(high, len(target_ids))
+        low = min(low, high)
+        rows = (
+            model(recipe_id=recipe_id, **{field: target_id}, **(
+                {'amount': self.rng.randint(1, 500)}
+                if model is IngredientInRecipe else {}
+            ))
+            for recipe_id in recipe_ids
+            for target_id in self.rng.sample(
+                target_ids, self.rng.randint(low, high)
+            )
+        )
+        count = len(self.insert(model, rows))
+        self.log(f'{model._meta.verbose_name_plural}: {count}')
+
+    def make_follows(self, user_ids, author_weights, mean):
+        def rows():
+            for user_id in user_ids:
+                size = self.count_around(mean, len(user_ids) - 1)
+                authors = set(self.rng.choices(
+                    user_ids, cum_weights=author_weights, k=size
+                ))
+                authors.discard(user_id)
+                for author_id in authors:
+                    yield Follow(user_id=user_id, author_id=author_id)
+        count = len(self.insert(Follow, rows()))
+        self.log(f'Подписок: {count}')
+
+    def make_user_recipes(self, model, user_ids, recipe_ids, mean):
+        rows = (
+            model(user_id=user_id, recipe_id=recipe_id)
+            for user_id in user_ids
+            for recipe_id in self.rng.sample(
+                recipe_ids, self.count_around(mean, len(recipe_ids))
+            )
+        )
+        count = len(self.insert(model, rows))
+        self.log(f'{model._meta.verbose_name_plural}: {count}')
@@ -0,0 +1,367 @@
+import base64
+import binascii
+import io
+import json
+import multiprocessing
+import os
+import uuid
+import zipfile
+from collections import Counter
+from contextlib import ExitStack
+from itertools import islice
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import F
+from PIL import Image
+
+from ingredients.models import Ingredients
+from recipes.images import build_image_variants
+from recipes.models import IngredientInRecipe, Recipe, TagsRecipe
+from tags.models import Tag
+from users.models import User
+
+MAX_SMALL_INTEGER = 32767
+NDJSON_SUFFIXES = ('.ndjson', '.jsonl')
+
+archive = None
+
+
+def open_archive(path):
+    """Инициализация процесса пула: свой дескриптор zip-архива"""
+    global archive
+    archive = zipfile.ZipFile(path) if path else None
+
+
+def read_image(source, base_dir):
+    if source.startswith('data:'):
+        header, _, data = source.partition(';base64,')
+        return base64.b64decode(data, validate=True)
+    if archive is not None:
+        return archive.read(source)
+    with open(os.path.join(base_dir, source), 'rb') as image_file:
+        return image_file.read()
+
+
+def save_image(task):
+    """Декодирует, проверяет и сохраняет фото, строит его копии.
+
+    Выполняется в процессе пула; возвращает (имя файла, копии, ошибка).
+    """
+    source, base_dir = task
+    try:
+        content = read_image(source, base_dir)
+        with Image.open(io.BytesIO(content)) as image:
+            image.verify()
+            extension = image.format.lower()
+    except (OSError, KeyError, ValueError, binascii.Error) as error:
+        return None, None, f'фото не прочитано: {error}'
+    name = default_storage.save(
+        f'recipes/{uuid.uuid4().hex}.{extension}', ContentFile(content)
+    )
+    try:
+        variants = build_image_variants(Recipe(image=name).image)
+    except Exception:
+        variants = {}
+    return name, variants, None
+
+
+def positive(value):
+    return (
+        isinstance(value, int) and not isinstance(value, bool)
+        and 1 <= value <= MAX_SMALL_INTEGER
+    )
+
+
+class Command(BaseCommand):
+    help = ('Загрузка рецептов из NDJSON (или zip-архива с NDJSON и фото) '
+            'пакетами с возможностью продолжить с места остановки')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help='Файл .ndjson/.jsonl или zip-архив с ним и фото'
+        )
+        parser.add_argument(
+            '--author',
+            help='Username автора для записей без поля author'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Количество рецептов в одной транзакции'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count(),
+            help='Процессы для обработки фото; 0 - без пула'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл с номером последней загруженной строки '
+                 '(по умолчанию <path>.checkpoint)'
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Начать сначала, не читая checkpoint'
+        )
+
+    def handle(self, *args, **options):
+        path = os.path.abspath(options['path'])
+        if not os.path.exists(path):
+            raise CommandError(f'Файл {path} не найден')
+        self.verbosity = options['verbosity']
+        self.base_dir = os.path.dirname(path)
+        self.checkpoint = options['checkpoint'] or f'{path}.checkpoint'
+        self.load_maps(options['author'])
+        start = 0 if options['restart'] else self.read_checkpoint()
+        self.stats = Counter(imported=0, skipped=0, malformed=0)
+        zip_path = path if zipfile.is_zipfile(path) else None
+        with ExitStack() as stack:
+            lines = stack.enter_context(self.open_records(path, zip_path))
+            self.pool = self.start_pool(stack, options['workers'], zip_path)
+            records = enumerate(lines, 1)
+            for _ in islice(records, start):
+                pass
+            while True:
+                batch = list(islice(records, options['batch_size']))
+                if not batch:
+                    break
+                self.import_batch(batch)
+                self.write_checkpoint(batch[-1][0])
+        if os.path.exists(self.checkpoint):
+            os.remove(self.checkpoint)
+        self.stdout.write(
+            'Добавлено: {imported}, уже были: {skipped}, '
+            'с ошибками: {malformed}'.format(**self.stats)
+        )
+
+    def load_maps(self, author):
+        self.ingredients = {}
+        for pk, name, unit in Ingredients.objects.values_list(
+            'pk', 'name', 'measurement_unit'
+        ):
+            self.ingredients[(name.lower(), unit.lower())] = pk
+            self.ingredients.setdefault((name.lower(), None), pk)
+        self.tags = {}
+        for pk, name, slug in Tag.objects.values_list('pk', 'name', 'slug'):
+            self.tags[slug] = pk
+            self.tags.setdefault(name.lower(), pk)
+        self.default_author = None
+        if author:
+            self.default_author = User.objects.filter(
+                username=author
+            ).values_list('pk', flat=True).first()
+            if self.default_author is None:
+                raise CommandError(f'Пользователь {author} не найден')
+
+    def open_records(self, path, zip_path):
+        if zip_path is None:
+            return open(path, encoding='UTF-8')
+        with zipfile.ZipFile(zip_path) as zip_file:
+            members = [
+                name for name in zip_file.namelist()
+                if name.endswith(NDJSON_SUFFIXES)
+            ]
+            if len(members) != 1:
+                raise CommandError(
+                    'В архиве должен быть ровно один файл .ndjson или .jsonl'
+                )
+            open_archive(zip_path)
+            return io.TextIOWrapper(
+                archive.open(members[0]), encoding='UTF-8'
+            )
+
+    def start_pool(self, stack, workers, zip_path):
+        if workers < 1:
+            return None
+        connections.close_all()
+        return stack.enter_context(multiprocessing.get_context('fork').Pool(
+            workers, initializer=open_archive, initargs=(zip_path,)
+        ))
+
+    def read_checkpoint(self):
+        if not os.path.exists(self.checkpoint):
+            return 0
+        with open(self.checkpoint, encoding='UTF-8') as checkpoint:
+            line = json.load(checkpoint)['line']
+        self.stdout.write(f'Продолжение со строки {line + 1}')
+        return line
+
+    def write_checkpoint(self, line):
+        temporary = f'{self.checkpoint}.tmp'
+        with open(temporary, 'w', encoding='UTF-8') as checkpoint:
+            json.dump({'line': line}, checkpoint)
+        os.replace(temporary, self.checkpoint)
+
+    def malformed(self, line_number, reason):
+        self.stats['malformed'] += 1
+        if self.verbosity > 1:
+            self.stderr.write(f'Строка {line_number}: {reason}')
+
+    def parse(self, line_number, line):
+        """Запись NDJSON -> поля рецепта с id связей или None"""
+        try:
+            record = json.loads(line)
+            ingredients = {}
+            for item in record['ingredients']:
+                key = (item['name'].lower(), (
+                    item['measurement_unit'].lower()
+                    if item.get('measurement_unit') else None
+                ))
+                if key not in self.ingredients or not positive(
+                    item['amount']
+                ):
+                    raise ValueError(f'ингредиент {item}')
+                ingredients[self.ingredients[key]] = item['amount']
+            tags = {
+                self.tags.get(tag, self.tags.get(tag.lower()))
+                for tag in record['tags']
+            }
+            author = record.get('author')
+            author = str(author) if author else self.default_author
+            recipe = {
+                'name': record['name'].strip()[:200],
+                'text': record['text'],
+                'cooking_time': record['cooking_time'],
+                'author_id': author,
+                'image': record['image'],
+            }
+        except (ValueError, KeyError, TypeError, AttributeError) as error:
+            self.malformed(line_number, error)
+            return None
+        if None in tags or not tags or not ingredients:
+            self.malformed(line_number, 'нет тегов или ингредиентов')
+            return None
+        if not recipe['name'] or not positive(recipe['cooking_time']):
+            self.malformed(line_number, 'нет названия или времени')
+            return None
+        return recipe, ingredients, tags
+
+    def resolve_authors(self, parsed):
+        usernames = {
+            recipe['author_id'] for _, (recipe, _, _) in parsed
+            if isinstance(recipe['author_id'], str)
+        }
+        authors = {
+            user.username: user.pk
+            for user in User.objects.filter(username__in=usernames).only(
+                'pk', 'username'
+            )
+        }
+        resolved = []
+        for line_number, (recipe, ingredients, tags) in parsed:
+            author = recipe['author_id']
+            if isinstance(author, str):
+                author = authors.get(author)
+            if author is None:
+                self.malformed(line_number, 'автор не найден')
+                continue
+            recipe['author_id'] = author
+            resolved.append((line_number, (recipe, ingredients, tags)))
+        return resolved
+
+    def new_records(self, batch):
+        parsed = [
+            (line_number, record) for line_number, record in (
+                (line_number, self.parse(line_number, line))
+                for line_number, line in batch if line.strip()
+            )
+            if record is not None
+        ]
+        parsed = self.resolve_authors(parsed)
+        seen = set(self.existing_recipes(
+            recipe for _, (recipe, _, _) in parsed
+        ))
+        records = []
+        for line_number, record in parsed:
+            key = (record[0]['name'], record[0]['author_id'])
+            if key in seen:
+                self.stats['skipped'] += 1
+                continue
+            seen.add(key)
+            records.append((line_number, record))
+        return records
+
+    @staticmethod
+    def existing_recipes(recipes):
+        """Id рецептов из таблицы по ключу (name, author_id) - как в
+        ограничении unique_name_author"""
+        recipes = list(recipes)
+        return {
+            (name, author_id): pk
+            for name, author_id, pk in Recipe.objects.filter(
+                name__in={recipe['name'] for recipe in recipes},
+                author_id__in={recipe['author_id'] for recipe in recipes}
+            ).values_list('name', 'author_id', 'pk')
+        }
+
+    def save_images(self, records):
+        tasks = [
+            (recipe['image'], self.base_dir)
+            for _, (recipe, _, _) in records
+        ]
+        if self.pool is None:
+            return [save_image(task) for task in tasks]
+        return self.pool.map(save_image, tasks)
+
+    def import_batch(self, batch):
+        records = self.new_records(batch)
+        saved = []
+        for (line_number, record), (name, variants, error) in zip(
+            records, self.save_images(records)
+        ):
+            if error:
+                self.malformed(line_number, error)
+                continue
+            record[0].update(image=name, image_variants=variants)
+            saved.append(record)
+        try:
+            with transaction.atomic():
+                self.insert(saved)
+        except Exception:
+            for recipe, _, _ in saved:
+                default_storage.delete(recipe['image'])
+            raise
+        self.stats['imported'] += len(saved)
+        if self.verbosity > 1:
+            self.stdout.write(f'Строк обработано: {batch[-1][0]}')
+
+    def insert(self, records):
+        Recipe.objects.bulk_create(
+            Recipe(**recipe) for recipe, _, _ in records
+        )
+        recipe_ids = self.existing_recipes(
+            recipe for recipe, _, _ in records
+        )
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(
+                recipe_id=recipe_ids[recipe['name'], recipe['author_id']],
+                ingredient_id=ingredient_id,
+                amount=amount
+            )
+            for recipe, ingredients, _ in records
+            for ingredient_id, amount in ingredients.items()
+        )
+        TagsRecipe.objects.bulk_create(
+            TagsRecipe(
+                recipe_id=recipe_ids[recipe['name'], recipe['author_id']],
+                tag_id=tag_id
+            )
+            for recipe, _, tags in records
+            for tag_id in tags
+        )
+        by_count = {}
+        for author, count in Counter(
+            recipe['author_id'] for recipe, _, _ in records
+        ).items():
+            by_count.setdefault(count, []).append(author)
+        for count, authors in by_count.items():
+            User.objects.filter(pk__in=authors).update(
+                recipes_count=F('recipes_count') + count
+            )
@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.models import ShoppingCartIngredient
+
+
+class Command(BaseCommand):
+    help = ('Пересборка или проверка сумм ингредиентов в списках покупок. '
+            'Нужна после удаления позиций списков покупок в обход API, '
+            'например из админки')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Только сравнить таблицу с пересчётом, не изменяя её'
+        )
+        parser.add_argument(
+            '--user',
+            type=int,
+            action='append',
+            dest='users',
+            help='Id пользователя (можно указать несколько раз)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Размер пакета для bulk_create'
+        )
+
+    def handle(self, *args, **options):
+        users = options['users']
+        if options['verify']:
+            self.verify(users)
+            return
+        with transaction.atomic():
+            ShoppingCartIngredient.objects.rebuild(
+                users,
+                batch_size=options['batch_size']
+            )
+        self.stdout.write(self.style.SUCCESS('Списки покупок пересобраны'))
+
+    def verify(self, users):
+        expected = ShoppingCartIngredient.objects.aggregate_from_carts(users)
+        queryset = ShoppingCartIngredient.objects.all()
+        if users is not None:
+            queryset = queryset.filter(user_id__in=users)
+        actual = {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount in queryset.values_list(
+                'user_id', 'ingredient_id', 'amount'
+            )
+        }
+        mismatches = [
+            (key, actual.get(key), expected.get(key))
+            for key in sorted({*expected, *actual})
+            if actual.get(key) != expected.get(key)
+        ]
+        for (user_id, ingredient_id), stored, computed in mismatches:
+            self.stdout.write(
+                f'user={user_id} ingredient={ingredient_id}: '
+                f'в таблице {stored}, по спискам {computed}'
+            )
+        if mismatches:
+            raise CommandError(f'Расхождений: {len(mismatches)}')
+        self.stdout.write(self.style.SUCCESS('Расхождений нет'))
@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import FavoriteRecipes, Recipe, ShoppingList
+from users.models import Follow, User
+
+
+def count_of(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(
+            **{field: OuterRef('pk')}
+        ).order_by().values(field).annotate(
+            total=Count('pk')
+        ).values('total')
+    ), 0)
+
+
+COUNTERS = (
+    (Recipe, {
+        'favorites_count': (FavoriteRecipes, 'recipe'),
+        'shopping_cart_count': (ShoppingList, 'recipe'),
+    }),
+    (User, {
+        'recipes_count': (Recipe, 'author'),
+        'followers_count': (Follow, 'author'),
+    }),
+)
+
+
+class Command(BaseCommand):
+    help = 'Сверка и пересчёт счётчиков рецептов и пользователей'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только показать расхождения, не исправляя их'
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        with transaction.atomic():
+            for model, counters in COUNTERS:
+                expected = {
+                    f'expected_{field}': count_of(*source)
+                    for field, source in counters.items()
+                }
+                mismatch = Q()
+                for field in counters:
+                    mismatch |= ~Q(**{field: F(f'expected_{field}')})
+                wrong = model.objects.annotate(**expected).filter(mismatch)
+                count = wrong.count()
+                total += count
+                self.stdout.write(
+                    f'{model._meta.verbose_name_plural}: '
+                    f'расхождений {count}'
+                )
+                if count and not options['check']:
+                    model.objects.filter(
+                        pk__in=list(wrong.values_list('pk', flat=True))
+                    ).update(**{
+                        field: count_of(*source)
+                        for field, source in counters.items()
+                    })
+        if total and options['check']:
+            raise CommandError(f'Расхождений: {total}')
+        self.stdout.write(self.style.SUCCESS('Счётчики сверены'))
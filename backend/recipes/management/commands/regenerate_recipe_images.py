@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import update_image_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Пересоздание уменьшенных копий фото рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Пересоздать копии и для рецептов, где они актуальны'
+        )
+        parser.add_argument(
+            '--recipe',
+            type=int,
+            action='append',
+            help='Id рецепта; можно указать несколько раз'
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.only('pk', 'image', 'image_variants')
+        if options['recipe']:
+            recipes = recipes.filter(pk__in=options['recipe'])
+        updated = total = 0
+        for recipe in recipes.order_by('pk').iterator(
+            chunk_size=options['batch_size']
+        ):
+            total += 1
+            updated += update_image_variants(recipe, force=options['force'])
+        self.stdout.write(
+            f'Рецептов: {total}, копии пересозданы: {updated}'
+        )
@@ -0,0 +1,63 @@
+# Generated by Django 3.2.15 on 2026-10-18 03:14
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_cart_ingredients(apps, schema_editor):
+    ShoppingList = apps.get_model('recipes', 'ShoppingList')
+    ShoppingCartIngredient = apps.get_model(
+        'recipes', 'ShoppingCartIngredient'
+    )
+    rows = ShoppingList.objects.filter(
+        recipe__recipe_amount__isnull=False
+    ).values(
+        'user', 'recipe__recipe_amount__ingredient'
+    ).annotate(
+        value=models.Sum('recipe__recipe_amount__amount')
+    ).order_by()
+    ShoppingCartIngredient.objects.bulk_create(
+        [
+            ShoppingCartIngredient(
+                user_id=row['user'],
+                ingredient_id=row['recipe__recipe_amount__ingredient'],
+                amount=row['value']
+            )
+            for row in rows
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('ingredients', '0002_auto_20221020_1016'),
+        ('recipes', '0009_recipe_author_pub_date_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingCartIngredient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.PositiveIntegerField(help_text='Количество ингредиента в списке покупок', verbose_name='Количество ингредиента в списке покупок')),
+                ('ingredient', models.ForeignKey(help_text='Ингредиент', on_delete=django.db.models.deletion.CASCADE, related_name='ingredient_in_cart', to='ingredients.ingredients', verbose_name='Ингредиент')),
+                ('user', models.ForeignKey(help_text='Автор списка покупок', on_delete=django.db.models.deletion.CASCADE, related_name='user_cart_ingredients', to=settings.AUTH_USER_MODEL, verbose_name='Автор списка покупок')),
+            ],
+            options={
+                'verbose_name': 'Ингредиент в списке покупок',
+                'verbose_name_plural': 'Ингредиенты в списках покупок',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shoppingcartingredient',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='unique_cart_ingredient'),
+        ),
+        migrations.RunPython(
+            fill_cart_ingredients,
+            migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.15 on 2026-10-18 04:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+import recipes.search
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0014_recipe_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeSearchIndex',
+            fields=[
+                ('recipe', models.OneToOneField(db_column='rowid', db_constraint=False, help_text='Рецепт', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_index', serialize=False, to='recipes.recipe', verbose_name='Рецепт')),
+                ('document', recipes.search.FullTextDocumentField(db_column='recipes_recipe_fts', help_text='Документ поиска', verbose_name='Документ поиска')),
+            ],
+            options={
+                'verbose_name': 'Поисковый индекс рецепта',
+                'verbose_name_plural': 'Поисковый индекс рецептов',
+                'db_table': 'recipes_recipe_fts',
+                'managed': False,
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.15 on 2026-10-18 04:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0015_recipesearchindex'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='name',
+            field=models.CharField(help_text='Название', max_length=200, verbose_name='Название'),
+        ),
+    ]
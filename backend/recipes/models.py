@@ -1,16 +1,97 @@
+from collections import defaultdict
+
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models import BooleanField, Exists, OuterRef, Prefetch, Value
 from django.db.models.constraints import UniqueConstraint
+from django.utils import timezone
 
 from ingredients.models import Ingredients
 from tags.models import Tag
-from users.models import User
+from users.models import Follow, User
+
+from .search import FullTextDocumentField
+
+VALIDATOR_FIELDS = (
+    'id',
+    'pub_date',
+    'updated_at',
+    'favorites_count',
+    'shopping_cart_count',
+    'is_favorited',
+    'is_in_shopping_cart',
+    'is_subscribed',
+    'author_id',
+    'author__email',
+    'author__username',
+    'author__first_name',
+    'author__last_name',
+    'author__recipes_count',
+    'author__followers_count',
+)
+
+
+def recipe_prefetches():
+    """Теги и ингредиенты, нужные для вывода рецепта"""
+    return (
+        Prefetch('tags', queryset=Tag.objects.all()),
+        Prefetch(
+            'recipe_amount',
+            queryset=IngredientInRecipe.objects.select_related('ingredient')
+        ),
+    )
+
+
+class RecipeQuerySet(models.QuerySet):
+
+    def with_related(self):
+        """Автор, теги и ингредиенты для вывода рецептов"""
+        return self.select_related('author').prefetch_related(
+            *recipe_prefetches()
+        )
+
+    def with_user_flags(self, user):
+        """Флаги избранного и корзины для пользователя одним запросом"""
+        if user is None or user.is_anonymous:
+            return self.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField())
+            )
+        return self.annotate(
+            is_favorited=Exists(FavoriteRecipes.objects.filter(
+                user=user,
+                recipe=OuterRef('pk')
+            )),
+            is_in_shopping_cart=Exists(ShoppingList.objects.filter(
+                user=user,
+                recipe=OuterRef('pk')
+            ))
+        )
+
+    def validators(self, user):
+        """Поля, от которых зависит представление рецепта для пользователя.
+
+        Дешёвая замена полной выборке для ETag; ожидает with_user_flags.
+        """
+        if user is None or user.is_anonymous:
+            is_subscribed = Value(False, output_field=BooleanField())
+        else:
+            is_subscribed = Exists(Follow.objects.filter(
+                user=user,
+                author=OuterRef('author')
+            ))
+        return self.prefetch_related(None).annotate(
+            is_subscribed=is_subscribed
+        ).values(*VALIDATOR_FIELDS)
+
+    def touch(self):
+        """Отмечает рецепты изменёнными"""
+        return self.update(updated_at=timezone.now())
 
 
 class Recipe(models.Model):
     name = models.CharField(
         max_length=200,
-        unique=True,
         verbose_name='Название',
         help_text='Название'
     )
@@ -30,6 +111,13 @@ class Recipe(models.Model):
         verbose_name='Изображение',
         help_text='Изображение'
     )
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Уменьшенные копии изображения',
+        help_text='Пути к уменьшенным копиям изображения по размерам'
+    )
     ingredients = models.ManyToManyField(
         Ingredients,
         verbose_name='Ингредиенты',
@@ -54,6 +142,24 @@ class Recipe(models.Model):
         verbose_name='Дата публикации',
         help_text='Дата публикации'
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения',
+        help_text='Дата изменения'
+    )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        db_index=True,
+        verbose_name='В избранном у пользователей',
+        help_text='В избранном у пользователей'
+    )
+    shopping_cart_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='В списках покупок у пользователей',
+        help_text='В списках покупок у пользователей'
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         constraints = [
@@ -62,6 +168,12 @@ class Recipe(models.Model):
                 name='unique_name_author'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='recipe_author_pub_date_idx'
+            )
+        ]
         ordering = ['-pub_date']
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
@@ -197,3 +309,194 @@ class ShoppingList(models.Model):
 
     def __str__(self):
         return f'Рецепт {self.recipe} в списке покупок у {self.user}'
+
+
+RECIPE_COUNTERS = {
+    FavoriteRecipes: 'favorites_count',
+    ShoppingList: 'shopping_cart_count',
+}
+
+
+class ShoppingCartIngredientManager(models.Manager):
+
+    def apply(self, deltas):
+        """Изменение сумм по словарю {(user_id, ingredient_id): delta}.
+
+        Недостающие строки сначала вставляются с нулём и ignore_conflicts:
+        так параллельные корзины не падают на уникальном индексе, а после
+        вставки все нужные строки блокируются select_for_update.
+        """
+        deltas = {key: delta for key, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        self.bulk_create(
+            [
+                self.model(
+                    user_id=user_id,
+                    ingredient_id=ingredient_id,
+                    amount=0
+                )
+                for (user_id, ingredient_id), delta in deltas.items()
+                if delta > 0
+            ],
+            ignore_conflicts=True
+        )
+        existing = {
+            (row.user_id, row.ingredient_id): row
+            for row in self.select_for_update().filter(
+                user_id__in={user_id for user_id, _ in deltas},
+                ingredient_id__in={
+                    ingredient_id for _, ingredient_id in deltas
+                }
+            )
+        }
+        to_update, to_delete = [], []
+        for key, delta in deltas.items():
+            row = existing.get(key)
+            if row is None:
+                continue
+            row.amount += delta
+            if row.amount > 0:
+                to_update.append(row)
+            else:
+                to_delete.append(row.pk)
+        self.bulk_update(to_update, ['amount'])
+        self.filter(pk__in=to_delete).delete()
+
+    def add_recipe(self, user, recipe, sign=1):
+        self.add_recipes(user, [recipe.pk], sign)
+
+    def add_recipes(self, user, recipe_ids, sign=1):
+        """Добавление в корзину нескольких рецептов (sign=-1 - удаление)"""
+        deltas = defaultdict(int)
+        for ingredient_id, amount in IngredientInRecipe.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list('ingredient_id', 'amount'):
+            deltas[(user.id, ingredient_id)] += sign * amount
+        self.apply(deltas)
+
+    def remove_recipe(self, user, recipe):
+        self.add_recipe(user, recipe, sign=-1)
+
+    def change_recipe(self, recipe, old_amounts, new_amounts):
+        """Пересчёт корзин, где лежит рецепт, после смены ингредиентов.
+
+        recipe - рецепт или его id, суммы - словари {ingredient_id: amount}.
+        """
+        changes = {
+            ingredient_id: (
+                new_amounts.get(ingredient_id, 0)
+                - old_amounts.get(ingredient_id, 0)
+            )
+            for ingredient_id in {*old_amounts, *new_amounts}
+        }
+        users = ShoppingList.objects.filter(
+            recipe=recipe
+        ).values_list('user_id', flat=True)
+        self.apply({
+            (user_id, ingredient_id): delta
+            for user_id in users
+            for ingredient_id, delta in changes.items()
+        })
+
+    def aggregate_from_carts(self, users=None):
+        """Суммы, посчитанные заново по спискам покупок"""
+        queryset = ShoppingList.objects.filter(
+            recipe__recipe_amount__isnull=False
+        )
+        if users is not None:
+            queryset = queryset.filter(user_id__in=users)
+        return {
+            (row['user'], row['recipe__recipe_amount__ingredient']):
+                row['value']
+            for row in queryset.values(
+                'user',
+                'recipe__recipe_amount__ingredient'
+            ).annotate(
+                value=models.Sum('recipe__recipe_amount__amount')
+            ).order_by()
+        }
+
+    def rebuild(self, users=None, batch_size=None):
+        queryset = self.all()
+        if users is not None:
+            queryset = queryset.filter(user_id__in=users)
+        queryset.delete()
+        self.bulk_create(
+            [
+                self.model(
+                    user_id=user_id,
+                    ingredient_id=ingredient_id,
+                    amount=amount
+                )
+                for (user_id, ingredient_id), amount
+                in self.aggregate_from_carts(users).items()
+            ],
+            batch_size=batch_size
+        )
+
+
+class ShoppingCartIngredient(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='user_cart_ingredients',
+        verbose_name='Автор списка покупок',
+        help_text='Автор списка покупок'
+    )
+    ingredient = models.ForeignKey(
+        Ingredients,
+        on_delete=models.CASCADE,
+        related_name='ingredient_in_cart',
+        verbose_name='Ингредиент',
+        help_text='Ингредиент'
+    )
+    amount = models.PositiveIntegerField(
+        verbose_name='Количество ингредиента в списке покупок',
+        help_text='Количество ингредиента в списке покупок'
+    )
+
+    objects = ShoppingCartIngredientManager()
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_cart_ingredient'
+            )
+        ]
+        verbose_name = 'Ингредиент в списке покупок'
+        verbose_name_plural = 'Ингредиенты в списках покупок'
+
+    def __str__(self):
+        return (f'{self.ingredient.name} - {self.amount} '
+                f'{self.ingredient.measurement_unit} у {self.user}')
+
+
+class RecipeSearchIndex(models.Model):
+    """Таблица FTS5 для полнотекстового поиска на SQLite.
+
+    Таблицу и триггеры создаёт миграция 0014; модель нужна только для
+    того, чтобы присоединять таблицу к рецептам в запросах поиска.
+    """
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column='rowid',
+        db_constraint=False,
+        related_name='search_index',
+        verbose_name='Рецепт',
+        help_text='Рецепт'
+    )
+    document = FullTextDocumentField(
+        db_column='recipes_recipe_fts',
+        verbose_name='Документ поиска',
+        help_text='Документ поиска'
+    )
+
+    class Meta:
+        managed = False
+        db_table = 'recipes_recipe_fts'
+        verbose_name = 'Поисковый индекс рецепта'
+        verbose_name_plural = 'Поисковый индекс рецептов'
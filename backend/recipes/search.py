@@ -0,0 +1,68 @@
+import re
+
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVectorField)
+from django.db import connection, models
+from django.db.models import Lookup
+from django.db.models.expressions import RawSQL
+
+SEARCH_CONFIGS = ('russian', 'english')
+WORD = re.compile(r'\w+')
+
+
+class FullTextDocumentField(models.TextField):
+    """Скрытый столбец таблицы FTS5 SQLite с именем самой таблицы"""
+
+
+@FullTextDocumentField.register_lookup
+class FullTextMatch(Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', lhs_params + rhs_params
+
+
+def postgresql_search(queryset, term):
+    vector = RawSQL(
+        'recipes_recipe.search_vector', [], output_field=SearchVectorField()
+    )
+    queries = [
+        SearchQuery(term, config=config, search_type='websearch')
+        for config in SEARCH_CONFIGS
+    ]
+    query = queries[0]
+    for config_query in queries[1:]:
+        query |= config_query
+    return queryset.annotate(search_vector=vector).filter(
+        search_vector=query
+    ).annotate(search_rank=SearchRank(vector, query))
+
+
+def sqlite_search(queryset, term):
+    match = ' '.join(f'"{word}"*' for word in WORD.findall(term)) or '""'
+    return queryset.filter(search_index__document__match=match).annotate(
+        search_rank=RawSQL('-bm25(recipes_recipe_fts, 10.0, 1.0)', [])
+    )
+
+
+def search_recipes(queryset, term):
+    """Полнотекстовый поиск по названию и описанию рецепта.
+
+    На PostgreSQL - по колонке search_vector (русская и английская
+    конфигурации, индекс GIN), на SQLite - по таблице FTS5
+    recipes_recipe_fts (модель RecipeSearchIndex, присоединяется к рецептам
+    по rowid) с поиском по началу слов. Обе поддерживаются триггерами из
+    миграции recipes.0014. Результат упорядочен по
+    релевантности (search_rank), затем по дате.
+    """
+    if not term.strip():
+        return queryset
+    if connection.vendor == 'postgresql':
+        queryset = postgresql_search(queryset, term)
+    elif connection.vendor == 'sqlite':
+        queryset = sqlite_search(queryset, term)
+    else:
+        return queryset.filter(name__icontains=term.strip())
+    return queryset.order_by('-search_rank', '-pub_date', '-id')
@@ -0,0 +1,118 @@
+from django.db.models import F
+from django.db.models.signals import (post_delete, post_init, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from ingredients.models import Ingredients
+from tags.models import Tag
+from users.models import User
+
+from .models import (RECIPE_COUNTERS, FavoriteRecipes, IngredientInRecipe,
+                     Recipe, ShoppingCartIngredient, ShoppingList, TagsRecipe)
+from .tasks import generate_image_variants
+
+
+@receiver(post_save, sender=Recipe)
+def refresh_image_variants(instance, **kwargs):
+    if (
+        instance.image
+        and instance.image_variants.get('source') != instance.image.name
+    ):
+        generate_image_variants.delay(recipe_id=instance.pk)
+
+
+@receiver(post_save, sender=Recipe)
+def count_created_recipe(instance, created, **kwargs):
+    if created:
+        User.objects.filter(pk=instance.author_id).update(
+            recipes_count=F('recipes_count') + 1
+        )
+
+
+@receiver(post_delete, sender=Recipe)
+def count_deleted_recipe(instance, **kwargs):
+    User.objects.filter(pk=instance.author_id).update(
+        recipes_count=F('recipes_count') - 1
+    )
+
+
+@receiver(post_save, sender=FavoriteRecipes)
+@receiver(post_save, sender=ShoppingList)
+def count_added_recipe(sender, instance, created, **kwargs):
+    if created:
+        counter = RECIPE_COUNTERS[sender]
+        Recipe.objects.filter(pk=instance.recipe_id).update(
+            **{counter: F(counter) + 1}
+        )
+
+
+@receiver(post_delete, sender=FavoriteRecipes)
+@receiver(post_delete, sender=ShoppingList)
+def count_removed_recipe(sender, instance, **kwargs):
+    counter = RECIPE_COUNTERS[sender]
+    Recipe.objects.filter(pk=instance.recipe_id).update(
+        **{counter: F(counter) - 1}
+    )
+
+
+@receiver(post_init, sender=IngredientInRecipe)
+def remember_amount(instance, **kwargs):
+    """Запоминает сохраненное состояние строки, чтобы при сохранении
+    применить к корзинам только разницу"""
+    instance._saved_amount = (
+        instance.__dict__.get('recipe_id'),
+        instance.__dict__.get('ingredient_id'),
+        instance.__dict__.get('amount'),
+    )
+
+
+@receiver(post_save, sender=IngredientInRecipe)
+def change_cart_amount(instance, created, **kwargs):
+    """Пересчитывает суммы корзин при любом сохранении через save():
+    из админки, инлайна рецепта или ORM. Массовые bulk_create и
+    bulk_update сигналов не вызывают, их пересчитывает вызывающий код"""
+    recipe_id, ingredient_id, amount = instance._saved_amount
+    if not created and recipe_id != instance.recipe_id:
+        ShoppingCartIngredient.objects.change_recipe(
+            recipe_id, {ingredient_id: amount}, {}
+        )
+        created = True
+    ShoppingCartIngredient.objects.change_recipe(
+        instance.recipe_id,
+        {} if created else {ingredient_id: amount},
+        {instance.ingredient_id: instance.amount}
+    )
+    remember_amount(instance)
+
+
+@receiver(pre_delete, sender=IngredientInRecipe)
+def remove_cart_amount(instance, **kwargs):
+    """Вычитает строку из корзин при любом удалении, в том числе
+    каскадном (рецепта, автора или ингредиента). Используется pre_delete:
+    при каскаде списки покупок удаляются вместе со строками, и после
+    удаления уже не видно, в чьих корзинах лежал рецепт"""
+    ShoppingCartIngredient.objects.change_recipe(
+        instance.recipe_id, {instance.ingredient_id: instance.amount}, {}
+    )
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def touch_tag_recipes(instance, **kwargs):
+    Recipe.objects.filter(tags=instance).touch()
+
+
+@receiver(post_save, sender=Ingredients)
+@receiver(pre_delete, sender=Ingredients)
+def touch_ingredient_recipes(instance, **kwargs):
+    Recipe.objects.filter(ingredients=instance).touch()
+
+
+@receiver(post_save, sender=IngredientInRecipe)
+@receiver(post_delete, sender=IngredientInRecipe)
+@receiver(post_save, sender=TagsRecipe)
+@receiver(post_delete, sender=TagsRecipe)
+def touch_recipe(instance, **kwargs):
+    """Меняет updated_at и ETag рецепта при правке его ингредиентов и
+    тегов поштучно: из админки, инлайна или ORM"""
+    Recipe.objects.filter(pk=instance.recipe_id).touch()
@@ -0,0 +1,22 @@
+from sorl.thumbnail import delete
+
+from jobs.queue import task
+
+from .images import update_image_variants
+from .models import Recipe
+
+
+@task
+def generate_image_variants(recipe_id):
+    recipe = Recipe.objects.filter(pk=recipe_id).only(
+        'pk', 'image', 'image_variants'
+    ).first()
+    if recipe is not None:
+        update_image_variants(recipe)
+
+
+@task
+def delete_recipe_image(image):
+    """Удаляет фото и его копии, если им не пользуется другой рецепт"""
+    if image and not Recipe.objects.filter(image=image).exists():
+        delete(image)
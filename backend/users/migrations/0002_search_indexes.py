@@ -0,0 +1,23 @@
+from django.db import migrations
+
+from foodgram.operations import AddPostgresIndexesConcurrently
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('ingredients', '0003_name_search_indexes'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        AddPostgresIndexesConcurrently({
+            'users_username_upper_trgm': (
+                'users_user USING gin (UPPER("username"::text) gin_trgm_ops)'
+            ),
+            'users_email_upper_trgm': (
+                'users_user USING gin (UPPER("email"::text) gin_trgm_ops)'
+            ),
+        }),
+    ]
@@ -0,0 +1,51 @@
+import io
+
+import pytest
+from django.core.management import call_command
+from django.db.models import Count
+
+from recipes.models import FavoriteRecipes, Recipe, ShoppingList
+from users.models import Follow, User
+
+
+@pytest.fixture
+def users(db, settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    call_command(
+        'generate_fake_data',
+        users=10,
+        recipes=30,
+        ingredients=20,
+        tags=3,
+        stdout=io.StringIO()
+    )
+
+
+def reconcile_check():
+    call_command('reconcile_counters', check=True, stdout=io.StringIO())
+
+
+def test_counters_follow_orm_changes(users):
+    user, author = User.objects.order_by('pk')[:2]
+    Follow.objects.filter(user=user).delete()
+    Follow.objects.create(user=user, author=author)
+    recipe = Recipe.objects.create(
+        author=user, name='Новый', text='Текст', cooking_time=5
+    )
+    FavoriteRecipes.objects.get_or_create(user=author, recipe=recipe)
+    ShoppingList.objects.get_or_create(user=author, recipe=recipe)
+    reconcile_check()
+    FavoriteRecipes.objects.filter(recipe=recipe).delete()
+    recipe.delete()
+    reconcile_check()
+
+
+def test_counters_after_user_delete(users):
+    user = User.objects.annotate(
+        recipes=Count('author_recipe', distinct=True),
+        favorites=Count('user_favorites', distinct=True),
+        follows=Count('follower', distinct=True),
+    ).filter(recipes__gt=0, favorites__gt=0, follows__gt=0).first()
+    assert user is not None
+    user.delete()
+    reconcile_check()
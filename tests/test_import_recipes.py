@@ -0,0 +1,81 @@
+import base64
+import io
+import json
+
+import pytest
+from django.core.management import call_command
+from PIL import Image
+
+from ingredients.models import Ingredients
+from recipes.models import Recipe
+from tags.models import Tag
+from users.models import User
+
+
+@pytest.fixture
+def authors(db, settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    Ingredients.objects.create(name='мука', measurement_unit='г')
+    Tag.objects.create(name='Завтрак', color='#E26C2D', slug='breakfast')
+    return [
+        User.objects.create_user(
+            username=username,
+            email=f'{username}@example.com',
+            password='password',
+            first_name=username,
+            last_name=username
+        )
+        for username in ('anna', 'boris')
+    ]
+
+
+def image():
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 8)).save(buffer, 'PNG')
+    return 'data:image/png;base64,' + base64.b64encode(
+        buffer.getvalue()
+    ).decode()
+
+
+def write_records(path, authors, amount):
+    path.write_text('\n'.join(
+        json.dumps({
+            'name': 'Блины',
+            'text': 'Текст',
+            'cooking_time': 20,
+            'author': author,
+            'image': image(),
+            'tags': ['breakfast'],
+            'ingredients': [
+                {'name': 'мука', 'measurement_unit': 'г', 'amount': amount}
+            ],
+        })
+        for author in authors
+    ), encoding='UTF-8')
+
+
+def import_recipes(path):
+    call_command(
+        'import_recipes', str(path), workers=0, restart=True,
+        stdout=io.StringIO()
+    )
+
+
+def test_same_name_for_different_authors(authors, tmp_path):
+    path = tmp_path / 'recipes.ndjson'
+    write_records(path, ['anna', 'boris', 'anna'], 100)
+    import_recipes(path)
+    recipes = Recipe.objects.filter(name='Блины').order_by('author__username')
+    assert [recipe.author.username for recipe in recipes] == ['anna', 'boris']
+    for recipe in recipes:
+        assert list(recipe.recipe_amount.values_list('amount', flat=True)) \
+            == [100]
+        assert list(recipe.tags.values_list('slug', flat=True)) \
+            == ['breakfast']
+    assert [
+        author.recipes_count
+        for author in User.objects.filter(pk__in=[a.pk for a in authors])
+    ] == [1, 1]
+    write_records(path, ['boris'], 200)
+    import_recipes(path)
+    assert Recipe.objects.filter(name='Блины').count() == 2
@@ -0,0 +1,44 @@
+from http import HTTPStatus
+
+import pytest
+from rest_framework.test import APIClient
+
+from ingredients.models import Ingredients
+from ingredients.search import ingredient_index
+
+URL = '/api/ingredients/?name=сол'
+
+
+@pytest.fixture
+def ingredients(db):
+    Ingredients.objects.bulk_create([
+        Ingredients(name='соль', measurement_unit='г'),
+        Ingredients(name='морская соль', measurement_unit='г'),
+        Ingredients(name='сахар', measurement_unit='г'),
+    ])
+    ingredient_index.invalidate()
+
+
+def names(response):
+    return [row['name'] for row in response.json()]
+
+
+def test_warm_index_makes_no_queries(ingredients,
+                                     django_assert_num_queries):
+    client = APIClient()
+    assert client.get(URL).status_code == HTTPStatus.OK
+    with django_assert_num_queries(0):
+        response = client.get(URL)
+    assert names(response) == ['соль', 'морская соль']
+
+
+def test_index_follows_model_changes(ingredients):
+    client = APIClient()
+    client.get(URL)
+    solod = Ingredients.objects.create(name='солод', measurement_unit='г')
+    assert names(client.get(URL)) == ['солод', 'соль', 'морская соль']
+    solod.name = 'ячмень'
+    solod.save()
+    assert names(client.get(URL)) == ['соль', 'морская соль']
+    Ingredients.objects.get(name='соль').delete()
+    assert names(client.get(URL)) == ['морская соль']
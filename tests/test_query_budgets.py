@@ -0,0 +1,102 @@
+import io
+import json
+from http import HTTPStatus
+
+import pytest
+from django.core.management import call_command
+from django.db.models import Count
+from rest_framework.test import APIClient
+
+from api.management.commands.benchmark_api import BUDGETS_PATH
+from ingredients.models import Ingredients
+from recipes.models import Recipe
+from tags.models import Tag
+from users.models import User
+
+with open(BUDGETS_PATH, encoding='UTF-8') as budgets_file:
+    BUDGETS = json.load(budgets_file)
+
+FLOWS = (
+    ('recipe-list', '/api/recipes/?limit=30'),
+    ('recipe-list', '/api/recipes/?limit=30&tags={tag}&author={author}'),
+    ('recipe-list',
+     '/api/recipes/?limit=30&is_favorited=1&is_in_shopping_cart=1'),
+    ('recipe-list', '/api/recipes/?limit=30&ordering=popular'),
+    ('recipe-search', '/api/recipes/?limit=30&search=рецепт&tags={tag}'),
+    ('recipe-list-cursor', '/api/recipes/?limit=30&pagination=cursor'),
+    ('recipe-detail', '/api/recipes/{recipe}/'),
+    ('subscriptions', '/api/users/subscriptions/?limit=30&recipes_limit=3'),
+    ('user-list', '/api/users/?limit=30'),
+    ('ingredient-search', '/api/ingredients/?name={ingredient}'),
+    ('tag-list', '/api/tags/'),
+    ('shopping-cart-download',
+     '/api/recipes/download_shopping_cart/?format=txt'),
+)
+
+NOT_MODIFIED_FLOWS = (
+    ('recipe-list-not-modified', '/api/recipes/?limit=30'),
+    ('recipe-detail-not-modified', '/api/recipes/{recipe}/'),
+)
+
+
+@pytest.fixture
+def viewer(db, settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    call_command(
+        'generate_fake_data',
+        users=20,
+        recipes=60,
+        ingredients=50,
+        tags=4,
+        stdout=io.StringIO()
+    )
+    return User.objects.annotate(
+        follows=Count('follower')
+    ).order_by('-follows').first()
+
+
+@pytest.fixture
+def viewer_client(viewer):
+    client = APIClient()
+    client.force_authenticate(viewer)
+    return client
+
+
+@pytest.fixture
+def url_values(viewer):
+    return {
+        'tag': Tag.objects.values_list('slug', flat=True)[0],
+        'author': viewer.follower.values_list('author', flat=True)[0],
+        'recipe': Recipe.objects.values_list('pk', flat=True)[0],
+        'ingredient': Ingredients.objects.values_list(
+            'name', flat=True
+        )[0][:3],
+    }
+
+
+def get(client, url, **headers):
+    response = client.get(url, **headers)
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response
+
+
+@pytest.mark.parametrize('group, url', FLOWS)
+def test_query_budget(viewer_client, url_values,
+                      django_assert_max_num_queries, group, url):
+    url = url.format(**url_values)
+    assert get(viewer_client, url).status_code == HTTPStatus.OK
+    with django_assert_max_num_queries(BUDGETS[group]['queries']):
+        response = get(viewer_client, url)
+    assert response.status_code == HTTPStatus.OK
+
+
+@pytest.mark.parametrize('group, url', NOT_MODIFIED_FLOWS)
+def test_not_modified_query_budget(viewer_client, url_values,
+                                   django_assert_max_num_queries, group,
+                                   url):
+    url = url.format(**url_values)
+    etag = get(viewer_client, url)['ETag']
+    with django_assert_max_num_queries(BUDGETS[group]['queries']):
+        response = get(viewer_client, url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
@@ -0,0 +1,46 @@
+import io
+from http import HTTPStatus
+
+import pytest
+from django.core.management import call_command
+from rest_framework.test import APIClient
+
+from recipes.models import IngredientInRecipe, Recipe, TagsRecipe
+from tags.models import Tag
+
+
+@pytest.fixture
+def recipe(db, settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    call_command(
+        'generate_fake_data',
+        users=5,
+        recipes=10,
+        ingredients=20,
+        tags=3,
+        stdout=io.StringIO()
+    )
+    return Recipe.objects.filter(recipe_amount__isnull=False).first()
+
+
+def etag(recipe):
+    response = APIClient().get(f'/api/recipes/{recipe.pk}/')
+    assert response.status_code == HTTPStatus.OK
+    return response['ETag']
+
+
+def test_etag_changes_after_amount_change(recipe):
+    before = etag(recipe)
+    row = IngredientInRecipe.objects.filter(recipe=recipe).first()
+    row.amount += 1
+    row.save()
+    assert etag(recipe) != before
+
+
+def test_etag_changes_after_tag_change(recipe):
+    before = etag(recipe)
+    TagsRecipe.objects.filter(recipe=recipe).delete()
+    after_delete = etag(recipe)
+    assert after_delete != before
+    TagsRecipe.objects.create(recipe=recipe, tag=Tag.objects.first())
+    assert etag(recipe) != after_delete
@@ -0,0 +1,75 @@
+import io
+
+import pytest
+from django.core.management import call_command
+
+from ingredients.models import Ingredients
+from recipes.models import IngredientInRecipe, Recipe, ShoppingCartIngredient
+
+
+@pytest.fixture
+def carts(db, settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    call_command(
+        'generate_fake_data',
+        users=10,
+        recipes=30,
+        ingredients=20,
+        tags=3,
+        stdout=io.StringIO()
+    )
+
+
+def cart_amounts():
+    return {
+        (row.user_id, row.ingredient_id): row.amount
+        for row in ShoppingCartIngredient.objects.all()
+    }
+
+
+def assert_carts_consistent():
+    expected = ShoppingCartIngredient.objects.aggregate_from_carts()
+    assert cart_amounts() == expected
+
+
+def carted_row():
+    return IngredientInRecipe.objects.filter(
+        recipe__recipe_shoppinglist__isnull=False
+    ).first()
+
+
+def test_carts_follow_orm_changes(carts):
+    assert_carts_consistent()
+    row = carted_row()
+    row.amount += 7
+    row.save()
+    assert_carts_consistent()
+    row.ingredient = Ingredients.objects.exclude(
+        ingredient_in_recipe__recipe=row.recipe
+    ).first()
+    row.save()
+    assert_carts_consistent()
+    IngredientInRecipe.objects.create(
+        recipe=row.recipe,
+        ingredient=Ingredients.objects.exclude(
+            ingredient_in_recipe__recipe=row.recipe
+        ).first(),
+        amount=3
+    )
+    assert_carts_consistent()
+    carted_row().delete()
+    assert_carts_consistent()
+
+
+def test_carts_follow_cascade_delete(carts):
+    recipe = carted_row().recipe
+    recipe.delete()
+    assert_carts_consistent()
+    Recipe.objects.filter(author=Recipe.objects.first().author).delete()
+    assert_carts_consistent()
+    Ingredients.objects.filter(
+        ingredient_in_recipe__recipe__recipe_shoppinglist__isnull=False
+    ).first().delete()
+    assert_carts_consistent()
+    recipe.author.delete()
+    assert_carts_consistent()
@@ -0,0 +1,41 @@
+from http import HTTPStatus
+
+import pytest
+from rest_framework.test import APIClient
+
+from api.caches import tag_list_cache
+from tags.models import Tag
+
+URL = '/api/tags/'
+
+
+@pytest.fixture
+def tags(db):
+    Tag.objects.bulk_create([
+        Tag(name='Завтрак', color='#E26C2D', slug='breakfast'),
+        Tag(name='Обед', color='#49B64E', slug='lunch'),
+    ])
+    tag_list_cache.invalidate()
+
+
+def slugs(response):
+    return [tag['slug'] for tag in response.json()]
+
+
+def test_warm_tag_list_makes_no_queries(tags, django_assert_num_queries):
+    client = APIClient()
+    assert client.get(URL).status_code == HTTPStatus.OK
+    with django_assert_num_queries(0):
+        response = client.get(URL)
+    assert slugs(response) == ['breakfast', 'lunch']
+
+
+def test_tag_list_follows_model_changes(tags):
+    client = APIClient()
+    etag = client.get(URL)['ETag']
+    Tag.objects.create(name='Ужин', color='#8775D2', slug='dinner')
+    response = client.get(URL, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.OK
+    assert slugs(response) == ['breakfast', 'lunch', 'dinner']
+    Tag.objects.get(slug='lunch').delete()
+    assert slugs(client.get(URL)) == ['breakfast', 'dinner']